@@ -0,0 +1 @@
+#root conftest so pytest puts the repo root on sys.path (tests import src.*)
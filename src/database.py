@@ -0,0 +1,147 @@
+#duckdb-backed storage for scraped sources.
+#
+#one schema per city, one table per source table -- same envelopes the
+#parquet writer takes, but queryable in place. checkpoints live in a
+#small main.scrape_checkpoints table so resume state travels with the
+#database file.
+
+from datetime import datetime
+
+import duckdb
+import pyarrow as pa
+
+_DUCK_TYPES = {
+    "int64": "BIGINT",
+    "float64": "DOUBLE",
+    "string": "VARCHAR",
+}
+
+_PA_TYPES = {
+    "int64": pa.int64(),
+    "float64": pa.float64(),
+    "string": pa.string(),
+}
+
+#below this many rows the arrow staging setup (table build + register +
+#unregister) costs more than the vectorized copy saves
+_ARROW_MIN_ROWS = 64
+
+#(db_path, city) pairs whose DDL has already run this process: a session
+#looping over cities re-instantiates writers, and IF NOT EXISTS still
+#pays parse + catalog lookup per statement every time
+_SCHEMA_READY = set()
+
+
+class DuckDBWriter:
+    """Writes scrape envelopes for one city into a duckdb database."""
+
+    def __init__(self, city, source, db_path=None, conn=None):
+        #an explicit conn lets callers reuse one connection across many
+        #loads; the writer only closes connections it opened itself
+        self.city = city
+        self.source = source
+        self._owns_conn = conn is None
+        if conn is not None:
+            self.conn = conn
+        elif db_path is not None:
+            self.conn = duckdb.connect(db_path)
+        else:
+            #duckdb.connect(None) raises; no-argument connect is in-memory
+            self.conn = duckdb.connect()
+        self._arrow_schemas = {
+            table: pa.schema(
+                [pa.field(name, _PA_TYPES[kind]) for name, kind in columns]
+                + [pa.field("scraped_at", pa.timestamp("us"))])
+            for table, columns in source.tables.items()
+        }
+        #insert statements and column orders are fixed per table; build
+        #them once here instead of on every batch
+        self._insert_sql = {
+            table: (f'INSERT INTO "{city}"."{table}" VALUES '
+                    f"({', '.join('?' * (len(columns) + 1))})")
+            for table, columns in source.tables.items()
+        }
+        self._column_names = {
+            table: [name for name, _ in columns]
+            for table, columns in source.tables.items()
+        }
+        #in-memory databases (db_path=None) can't share the guard: two
+        #separate :memory: connections are two separate catalogs
+        schema_key = (db_path, city) if db_path else None
+        if schema_key not in _SCHEMA_READY:
+            self._ensure_schema()
+            if schema_key is not None:
+                _SCHEMA_READY.add(schema_key)
+
+    def _ensure_schema(self):
+        self.conn.execute(f'CREATE SCHEMA IF NOT EXISTS "{self.city}"')
+        for table, columns in self.source.tables.items():
+            cols = ", ".join(
+                f'"{name}" {_DUCK_TYPES[kind]}' for name, kind in columns)
+            self.conn.execute(
+                f'CREATE TABLE IF NOT EXISTS "{self.city}"."{table}" '
+                f"({cols}, scraped_at TIMESTAMP)")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS main.scrape_checkpoints ("
+            "city VARCHAR PRIMARY KEY, last_pid BIGINT, "
+            "total_scraped BIGINT, updated_at TIMESTAMP)")
+
+    def write_batch(self, records):
+        #large batches go in as one vectorized arrow append: register the
+        #batch as a staging view and INSERT ... SELECT from it. small
+        #batches skip the arrow table build and staging round-trip and use
+        #a plain executemany on the cached insert statement instead
+        batch_time = datetime.now()
+        for table, columns in self.source.tables.items():
+            names = self._column_names[table]
+            rows = []
+            for record in records:
+                if table == "properties":
+                    items = [record["property"]]
+                else:
+                    items = record.get(table, [])
+                for item in items:
+                    rows.append([item.get(name) for name in names]
+                                + [batch_time])
+            if not rows:
+                continue
+            if len(rows) < _ARROW_MIN_ROWS:
+                self.conn.executemany(self._insert_sql[table], rows)
+            else:
+                schema = self._arrow_schemas[table]
+                staged = pa.table(
+                    [[row[i] for row in rows] for i in range(len(schema))],
+                    schema=schema)
+                self.conn.register("__stg", staged)
+                self.conn.execute(
+                    f'INSERT INTO "{self.city}"."{table}" '
+                    "SELECT * FROM __stg")
+                self.conn.unregister("__stg")
+
+    def write_arrow(self, table, staged):
+        #already-columnar rows (e.g. ipc batches from worker processes)
+        #skip the envelope walk and go straight through the staging view
+        self.conn.register("__stg", staged)
+        self.conn.execute(
+            f'INSERT INTO "{self.city}"."{table}" SELECT * FROM __stg')
+        self.conn.unregister("__stg")
+
+    def save_checkpoint(self, last_pid, total_scraped, conn=None):
+        #conn= lets a background thread write through its own cursor --
+        #duckdb wants one cursor per thread
+        (conn or self.conn).execute(
+            "INSERT OR REPLACE INTO main.scrape_checkpoints "
+            "VALUES (?, ?, ?, ?)",
+            [self.city, last_pid, total_scraped, datetime.now()])
+
+    def load_checkpoint(self):
+        row = self.conn.execute(
+            "SELECT last_pid, total_scraped FROM main.scrape_checkpoints "
+            "WHERE city = ?", [self.city]).fetchone()
+        if row is None:
+            return None
+        return {"last_pid": row[0], "total_scraped": row[1]}
+
+    def close(self):
+        if self._owns_conn:
+            self.conn.close()
@@ -0,0 +1,327 @@
+#load engine: fans a source's scrape_fn out over a worker pool, batches
+#results into a ParquetWriter, and checkpoints progress so a crashed city
+#load can resume where it left off.
+
+import atexit
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import itertools
+import queue
+import sys
+import threading
+import time
+
+_SENTINEL = object()  #end-of-work marker passed through the queues
+
+#one pool shared by every run_load in the process: thread startup is
+#10-100us each, which adds up when many small loads run back to back
+_POOL = None
+_POOL_WORKERS = 0  #size of _POOL, tracked here rather than a private attr
+_POOL_ACTIVE = 0  #loads currently running on a shared pool
+_POOL_LOCK = threading.Lock()
+
+
+def _acquire_pool(min_workers):
+    global _POOL, _POOL_WORKERS, _POOL_ACTIVE
+    with _POOL_LOCK:
+        if _POOL is None or _POOL_WORKERS < min_workers:
+            if _POOL is not None and _POOL_ACTIVE == 0:
+                _POOL.shutdown(wait=False)
+            #a too-small pool with loads still on it is left to drain:
+            #its threads exit on their own once the executor is
+            #collected, and shutting it down would kill those loads
+            _POOL = ThreadPoolExecutor(max_workers=min_workers,
+                                       thread_name_prefix="ctcs-load")
+            _POOL_WORKERS = min_workers
+        _POOL_ACTIVE += 1
+        return _POOL
+
+
+def _release_pool():
+    global _POOL_ACTIVE
+    with _POOL_LOCK:
+        _POOL_ACTIVE -= 1
+
+
+@atexit.register
+def _shutdown_pool():
+    if _POOL is not None:
+        _POOL.shutdown(wait=False)
+
+
+class RateLimiter:
+    """Token-bucket limiter shared by all workers of a load.
+
+    Each acquire() claims the next slot from an atomic counter and sleeps
+    until that slot's timestamp; there is no mutex on the hot path, so
+    workers never serialize on scheduling math, only on the wall clock.
+    """
+
+    _shared = {}  #requests_per_second -> process-wide limiter
+    _shared_lock = threading.Lock()
+
+    @classmethod
+    def shared(cls, requests_per_second):
+        #one limiter per rate for the whole process: a session looping
+        #over dozens of towns keeps O(1) limiter state instead of one
+        #per city, and loads against the same host share the budget
+        with cls._shared_lock:
+            limiter = cls._shared.get(requests_per_second)
+            if limiter is None:
+                limiter = cls._shared[requests_per_second] = cls(
+                    requests_per_second)
+            return limiter
+
+    def __init__(self, requests_per_second):
+        self.requests_per_second = requests_per_second
+        #integer nanoseconds: slot math in acquire() is int multiply and
+        #subtract, with no float rounding drift over long runs
+        self._interval_ns = (int(1_000_000_000 / requests_per_second)
+                             if requests_per_second else 0)
+        self._counter = itertools.count()  #next(...) is atomic under the GIL
+        self._t0_ns = time.monotonic_ns()
+        self._stats_lock = threading.Lock()
+        self._requests = 0
+        self._total_wait_ns = 0
+
+    @contextmanager
+    def acquire(self):
+        delay_ns = 0
+        if self._interval_ns:
+            slot = next(self._counter)
+            delay_ns = self._t0_ns + slot * self._interval_ns \
+                - time.monotonic_ns()
+            if delay_ns < -1_000_000_000:
+                #a limiter that sat idle has "saved up" every missed slot;
+                #re-anchor instead of letting a shared instance burst
+                #through them all at once
+                with self._stats_lock:
+                    behind_ns = self._t0_ns + slot * self._interval_ns \
+                        - time.monotonic_ns()
+                    if behind_ns < -1_000_000_000:
+                        self._t0_ns = time.monotonic_ns() \
+                            - slot * self._interval_ns
+                delay_ns = 0
+            if delay_ns > 0:
+                time.sleep(delay_ns / 1e9)
+        with self._stats_lock:
+            self._requests += 1
+            if delay_ns > 0:
+                self._total_wait_ns += delay_ns
+        yield
+
+    def get_stats(self):
+        with self._stats_lock:
+            return {"total_requests": self._requests,
+                    "total_wait_time": self._total_wait_ns / 1e9}
+
+
+def run_load(source, writer, base_url, iter_entries_fn, scope_key=None,
+             max_workers=4, batch_size=10, checkpoint_every=None,
+             rate_limiter=None, show_progress=True, resume=False,
+             executor=None):
+    """Scrape every entry id yielded by iter_entries_fn and persist it.
+
+    Returns the number of entries written (after refresh dedup, if the
+    writer has hashes preloaded).
+    """
+    scope = scope_key or writer.scope_key
+    last_entry_id = None
+    if resume:
+        checkpoint = writer.load_checkpoint(scope_key=scope)
+        if checkpoint:
+            last_entry_id = checkpoint["last_entry_id"]
+
+    def _scrape_one(entry_id):
+        if rate_limiter is not None:
+            with rate_limiter.acquire():
+                return source.scrape_fn(base_url, entry_id)
+        return source.scrape_fn(base_url, entry_id)
+
+    completed = 0
+    max_done = last_entry_id or 0
+    written_before = writer.rows_written
+    writer.batch_size = batch_size
+    entries = iter_entries_fn()
+    if last_entry_id is not None:
+        #entry ids arrive in order, so a resume is a seek on the iterator
+        #rather than a per-entry check in the fan-out loop
+        entries = itertools.dropwhile(
+            lambda entry_id: entry_id <= last_entry_id, entries)
+    #bounded queues on both sides give backpressure: submitting every
+    #entry as a future up front kept O(total entries) futures alive, and
+    #a burst of fast scrapes could pile results ahead of the writer.
+    #with this shape, peak memory stays O(max_workers) in both directions.
+    work_q = queue.Queue(maxsize=max_workers * 2)
+    result_q = queue.Queue(maxsize=max_workers * 2)
+    abort = threading.Event()  #set when the main thread errors out
+
+    def _produce():
+        try:
+            for entry_id in entries:
+                if abort.is_set():
+                    break
+                work_q.put(entry_id)
+        finally:
+            #always delivered, even when the caller's iterator raises
+            #mid-stream: without them every worker blocks on get() and
+            #the drain loop below blocks on result_q forever
+            for _ in range(max_workers):
+                work_q.put(_SENTINEL)
+
+    def _work():
+        while True:
+            entry_id = work_q.get()
+            if entry_id is _SENTINEL:
+                result_q.put(_SENTINEL)
+                return
+            if abort.is_set():
+                continue  #main thread failed; just eat queued entries
+            try:
+                record = _scrape_one(entry_id)
+            except Exception as exc:
+                sys.stderr.write(f"scrape failed for {entry_id}: {exc}\n")
+                continue
+            result_q.put((entry_id, record))
+
+    #producer + workers run on the shared pool (or a caller-provided one)
+    #so repeated loads reuse threads instead of spawning fresh ones
+    pool = executor if executor is not None else \
+        _acquire_pool(max_workers + 1)
+    try:
+        tasks = [pool.submit(_produce)]
+        tasks += [pool.submit(_work) for _ in range(max_workers)]
+
+        progress = None
+        if show_progress:
+            #imported lazily: quiet callers never pay for tqdm at all
+            from tqdm import tqdm
+            progress = tqdm(desc=scope)
+        #the main thread is the single writer: it drains results until
+        #every worker has passed its sentinel through
+        workers_done = 0
+        try:
+            while workers_done < max_workers:
+                item = result_q.get()
+                if item is _SENTINEL:
+                    workers_done += 1
+                    continue
+                entry_id, record = item
+                if progress is not None:
+                    progress.update(1)
+                writer.append(record, scope_key=scope)
+                completed += 1
+                max_done = max(max_done, entry_id)
+                if checkpoint_every and completed % checkpoint_every == 0:
+                    #one barrier per checkpoint: rows become durable
+                    #first, then the checkpoint that claims them
+                    writer.flush_all(scope_key=scope)
+                    writer.save_checkpoint(scope_key=scope,
+                                           last_entry_id=max_done,
+                                           total_scraped=completed)
+                    writer.flush_checkpoint(scope_key=scope)
+        except BaseException:
+            #an error here (e.g. flush_all re-raising a background write
+            #failure) must not strand pool threads on the bounded
+            #queues: flag the abort and keep result_q drained until the
+            #producer and every worker have returned the pool threads
+            abort.set()
+            while not all(task.done() for task in tasks):
+                try:
+                    result_q.get_nowait()
+                except queue.Empty:
+                    time.sleep(0.001)
+            raise
+
+        for task in tasks:
+            task.result()  #surface anything that escaped a worker loop
+    finally:
+        if executor is None:
+            _release_pool()
+    if progress is not None:
+        progress.close()
+
+    if checkpoint_every and completed:
+        writer.save_checkpoint(scope_key=scope, last_entry_id=max_done,
+                               total_scraped=completed)
+    #close() flushes the remainder, finalizes the open part files and
+    #persists the pending checkpoint -- in that order, so the scope is
+    #readable before the checkpoint claims it
+    writer.close()
+    return writer.rows_written - written_before
+
+
+async def run_load_async(source, writer, base_url, iter_entries_fn,
+                         scope_key=None, max_concurrency=32, batch_size=10,
+                         checkpoint_every=None, requests_per_second=None,
+                         resume=False):
+    """Asyncio variant of run_load for loads with hundreds of urls in flight.
+
+    A coroutine scrape_fn (e.g. aiohttp-based) is awaited directly, so each
+    in-flight request costs a coroutine frame instead of a thread stack; a
+    plain sync scrape_fn is pushed to the default executor, which makes this
+    a drop-in for the existing requests-based sources too. Rate limiting
+    reuses the token-bucket slot math with asyncio.sleep.
+    """
+    import asyncio
+
+    scope = scope_key or writer.scope_key
+    last_entry_id = None
+    if resume:
+        checkpoint = writer.load_checkpoint(scope_key=scope)
+        if checkpoint:
+            last_entry_id = checkpoint["last_entry_id"]
+
+    semaphore = asyncio.Semaphore(max_concurrency)
+    slots = itertools.count()
+    t0 = time.monotonic()
+    interval = 1.0 / requests_per_second if requests_per_second else 0.0
+    loop = asyncio.get_running_loop()
+    is_coroutine = asyncio.iscoroutinefunction(source.scrape_fn)
+
+    async def _scrape_one(entry_id):
+        async with semaphore:
+            if interval:
+                delay = t0 + next(slots) * interval - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            if is_coroutine:
+                return entry_id, await source.scrape_fn(base_url, entry_id)
+            return entry_id, await loop.run_in_executor(
+                None, source.scrape_fn, base_url, entry_id)
+
+    entries = [entry_id for entry_id in iter_entries_fn()
+               if last_entry_id is None or entry_id > last_entry_id]
+    completed = 0
+    max_done = last_entry_id or 0
+    written_before = writer.rows_written
+    writer.batch_size = batch_size
+    for task in asyncio.as_completed([_scrape_one(e) for e in entries]):
+        try:
+            entry_id, record = await task
+        except Exception as exc:
+            sys.stderr.write(f"scrape failed: {exc}\n")
+            continue
+        writer.append(record, scope_key=scope)
+        completed += 1
+        max_done = max(max_done, entry_id)
+        if checkpoint_every and completed % checkpoint_every == 0:
+            writer.flush_all(scope_key=scope)
+            writer.save_checkpoint(scope_key=scope, last_entry_id=max_done,
+                                   total_scraped=completed)
+            writer.flush_checkpoint(scope_key=scope)
+
+    if checkpoint_every and completed:
+        writer.save_checkpoint(scope_key=scope, last_entry_id=max_done,
+                               total_scraped=completed)
+    writer.close()
+    return writer.rows_written - written_before
+
+
+def run_refresh(source, writer, base_url, scope_key=None, **kwargs):
+    """Re-scrape everything already on disk, writing only changed rows."""
+    scope = scope_key or writer.scope_key
+    writer.preload_hashes(scope_key=scope)
+    known = sorted(writer.get_known_entry_ids(scope_key=scope))
+    return run_load(source, writer, base_url, lambda: iter(known),
+                    scope_key=scope, **kwargs)
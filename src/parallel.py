@@ -0,0 +1,220 @@
+#parallel city loader writing straight into duckdb. the parquet pipeline
+#in src.engine is the archival path; this one produces a queryable
+#database per run, which is what the ad-hoc town pulls want.
+
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import os
+import queue
+import sys
+import threading
+
+import requests
+
+from src.database import DuckDBWriter
+from src.engine import RateLimiter
+from src.sources.vgsi import VGSI_SOURCE, scrape_property
+
+
+#vgsi parcel endpoint, appended to a town root url
+_PARCEL_SUFFIX = "/Parcel.aspx?pid="
+
+#in-flight futures kept per worker by the sliding window
+_WINDOW_PER_WORKER = 2
+
+
+def _normalize_base_url(base_url):
+    #accept either the town root or a full Parcel.aspx?pid= prefix, as
+    #found in vgsi_cities.json
+    if base_url.endswith("pid="):
+        return base_url
+    return base_url.rstrip("/") + _PARCEL_SUFFIX
+
+
+def _offer_checkpoint(checkpoint_q, state):
+    #single producer: never block the scrape loop -- if the slot is
+    #taken, the stale state gets replaced by the newer one
+    try:
+        checkpoint_q.put_nowait(state)
+    except queue.Full:
+        try:
+            checkpoint_q.get_nowait()
+        except queue.Empty:
+            pass
+        checkpoint_q.put_nowait(state)
+
+
+def download_photo(url, dest_path):
+    os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+    response = requests.get(url, verify=False)
+    response.raise_for_status()
+    with open(dest_path, "wb") as photo_file:
+        photo_file.write(response.content)
+
+
+def load_city_parallel(city, base_url, pid_min, pid_max, db_path,
+                       max_workers=4, batch_size=10, checkpoint_every=None,
+                       requests_per_second=None, download_photos=False,
+                       photo_rate_limiter=None, show_progress=True,
+                       resume=False, conn=None):
+    """Scrape a pid range for one city into duckdb, max_workers at a time.
+
+    Returns the number of entries written. With resume=True the range
+    starts just past the city's last checkpoint. Callers looping over
+    many cities can pass conn= to reuse one connection; the writer then
+    leaves it open.
+    """
+    base = _normalize_base_url(base_url)
+    writer = DuckDBWriter(city, VGSI_SOURCE, db_path, conn=conn)
+    limiter = (RateLimiter.shared(requests_per_second)
+               if requests_per_second else None)
+    photo_dir = os.path.join(
+        os.path.dirname(os.path.abspath(db_path)), "photos", city)
+
+    pids = range(pid_min, pid_max + 1)
+    if resume:
+        #one bulk query + set difference instead of a per-pid existence
+        #check; this also catches pids that landed after the last
+        #checkpoint fired, so nothing is silently re-scraped
+        done = frozenset(row[0] for row in writer.conn.execute(
+            f'SELECT pid FROM "{city}".properties WHERE pid BETWEEN ? AND ?',
+            [pid_min, pid_max]).fetchall())
+        if done:
+            pids = [pid for pid in pids if pid not in done]
+    #one tight allocation pass outside the fan-out: workers never build
+    #url strings while holding their gil quantum
+    urls = {pid: base + str(pid) for pid in pids}
+
+    #photos ride a pool of their own: image bandwidth never serializes
+    #property scraping, and the two pools can be rate-limited apart
+    photo_pool = (ThreadPoolExecutor(max_workers=max_workers,
+                                     thread_name_prefix="ctcs-photo")
+                  if download_photos else None)
+    photo_futures = []
+
+    def _download_photo(photo_url, dest):
+        if photo_rate_limiter is not None:
+            with photo_rate_limiter.acquire():
+                download_photo(photo_url, dest)
+        else:
+            download_photo(photo_url, dest)
+
+    def _scrape_one(pid):
+        if limiter is not None:
+            with limiter.acquire():
+                record = scrape_property(base, pid, url=urls[pid])
+        else:
+            record = scrape_property(base, pid, url=urls[pid])
+        if photo_pool is not None:
+            for building in record.get("buildings", []):
+                photo_url = building.get("photo_url")
+                if photo_url:
+                    dest = os.path.join(
+                        photo_dir, f"{pid}_{building.get('bid', 0)}.jpg")
+                    photo_futures.append(
+                        photo_pool.submit(_download_photo, photo_url, dest))
+        return record
+
+    #checkpoints are written by one background thread fed through a
+    #single-slot queue: the scrape loop enqueues in O(1) and adjacent
+    #checkpoint states coalesce, so workers never stall on disk
+    checkpoint_q = None
+    checkpoint_thread = None
+    if checkpoint_every:
+        checkpoint_q = queue.Queue(maxsize=1)
+        checkpoint_conn = writer.conn.cursor()
+
+        def _drain_checkpoints():
+            while True:
+                state = checkpoint_q.get()
+                if state is None:
+                    return
+                try:
+                    while True:
+                        newer = checkpoint_q.get_nowait()
+                        if newer is None:
+                            writer.save_checkpoint(*state,
+                                                   conn=checkpoint_conn)
+                            return
+                        state = newer
+                except queue.Empty:
+                    pass
+                writer.save_checkpoint(*state, conn=checkpoint_conn)
+
+        checkpoint_thread = threading.Thread(target=_drain_checkpoints,
+                                             daemon=True)
+        checkpoint_thread.start()
+
+    buffer = []
+    completed = 0
+    max_done = pid_min - 1
+    written = 0
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            #sliding window of 2*max_workers in-flight futures, refilled
+            #as results land: memory stays O(max_workers) no matter how
+            #wide the pid range is
+            pid_iter = iter(pids)
+            inflight = {}
+            window = max_workers * _WINDOW_PER_WORKER
+
+            def _refill():
+                while len(inflight) < window:
+                    pid = next(pid_iter, None)
+                    if pid is None:
+                        return
+                    inflight[executor.submit(_scrape_one, pid)] = pid
+
+            progress = None
+            if show_progress:
+                #imported lazily: quiet callers never pay for tqdm at all
+                from tqdm import tqdm
+                progress = tqdm(total=len(pids), desc=city)
+            _refill()
+            while inflight:
+                ready, _ = wait(inflight, return_when=FIRST_COMPLETED)
+                for future in ready:
+                    pid = inflight.pop(future)
+                    if progress is not None:
+                        progress.update(1)
+                    try:
+                        record = future.result()
+                    except Exception as exc:
+                        sys.stderr.write(f"scrape failed for {pid}: {exc}\n")
+                        continue
+                    buffer.append(record)
+                    completed += 1
+                    max_done = max(max_done, pid)
+                    if len(buffer) >= batch_size:
+                        writer.write_batch(buffer)
+                        written += len(buffer)
+                        buffer.clear()
+                    if checkpoint_every \
+                            and completed % checkpoint_every == 0:
+                        _offer_checkpoint(checkpoint_q,
+                                          (max_done, completed))
+                _refill()
+            if progress is not None:
+                progress.close()
+        if buffer:
+            writer.write_batch(buffer)
+            written += len(buffer)
+        if photo_pool is not None:
+            photo_pool.shutdown(wait=True)
+            for future in photo_futures:
+                exc = future.exception()
+                if exc is not None:
+                    sys.stderr.write(f"photo download failed: {exc}\n")
+        if checkpoint_thread is not None:
+            #stop the background writer before the final save so a stale
+            #in-flight state can't land after it
+            checkpoint_q.put(None)
+            checkpoint_thread.join()
+            checkpoint_thread = None
+        if checkpoint_every and completed:
+            writer.save_checkpoint(max_done, completed)
+    finally:
+        if checkpoint_thread is not None:
+            checkpoint_q.put(None)
+            checkpoint_thread.join()
+        writer.close()
+    return written
@@ -0,0 +1,102 @@
+#asyncio + aiohttp variant of the duckdb city loader. one os thread and
+#a coroutine per in-flight request, so concurrency is bounded by fds
+#rather than thread stacks. the thread-pool loader in src.parallel stays
+#the default for modest worker counts; reach for this one when fanning
+#hundreds of parcels out at once.
+
+import asyncio
+import itertools
+import os
+import sys
+import time
+
+import aiohttp
+from selectolax.lexbor import LexborHTMLParser
+
+from src.database import DuckDBWriter
+from src.parallel import _normalize_base_url
+from src.sources.vgsi import VGSI_SOURCE, parse_parcel_page
+
+
+def _parse(html, pid):
+    #cpu-bound parsing runs in the default executor so the event loop
+    #stays free for network completions; the lexbor parse releases the
+    #gil too
+    return parse_parcel_page(LexborHTMLParser(html), pid)
+
+
+async def _fetch(session, url):
+    async with session.get(url) as response:
+        response.raise_for_status()
+        return await response.text()
+
+
+def load_city_async(city, base_url, pid_min, pid_max, db_path,
+                    max_concurrency=32, batch_size=10, checkpoint_every=None,
+                    requests_per_second=None, resume=False):
+    """Sync entry point; same contract as load_city_parallel."""
+    return asyncio.run(_load_city(
+        city, base_url, pid_min, pid_max, db_path, max_concurrency,
+        batch_size, checkpoint_every, requests_per_second, resume))
+
+
+async def _load_city(city, base_url, pid_min, pid_max, db_path,
+                     max_concurrency, batch_size, checkpoint_every,
+                     requests_per_second, resume):
+    base = _normalize_base_url(base_url)
+    writer = DuckDBWriter(city, VGSI_SOURCE, db_path)
+
+    start_pid = pid_min
+    if resume:
+        checkpoint = writer.load_checkpoint()
+        if checkpoint:
+            start_pid = max(pid_min, checkpoint["last_pid"] + 1)
+
+    semaphore = asyncio.Semaphore(max_concurrency)
+    slots = itertools.count()
+    t0 = time.monotonic()
+    interval = 1.0 / requests_per_second if requests_per_second else 0.0
+    loop = asyncio.get_running_loop()
+
+    buffer = []
+    completed = 0
+    max_done = start_pid - 1
+    written = 0
+    try:
+        connector = aiohttp.TCPConnector(limit=max_concurrency, ssl=False)
+        async with aiohttp.ClientSession(connector=connector) as session:
+
+            async def _scrape_one(pid):
+                async with semaphore:
+                    if interval:
+                        delay = t0 + next(slots) * interval - time.monotonic()
+                        if delay > 0:
+                            await asyncio.sleep(delay)
+                    html = await _fetch(session, base + str(pid))
+                return pid, await loop.run_in_executor(None, _parse, html, pid)
+
+            tasks = [_scrape_one(pid)
+                     for pid in range(start_pid, pid_max + 1)]
+            for task in asyncio.as_completed(tasks):
+                try:
+                    pid, record = await task
+                except Exception as exc:
+                    sys.stderr.write(f"scrape failed: {exc}\n")
+                    continue
+                buffer.append(record)
+                completed += 1
+                max_done = max(max_done, pid)
+                if len(buffer) >= batch_size:
+                    writer.write_batch(buffer)
+                    written += len(buffer)
+                    buffer.clear()
+                if checkpoint_every and completed % checkpoint_every == 0:
+                    writer.save_checkpoint(max_done, completed)
+        if buffer:
+            writer.write_batch(buffer)
+            written += len(buffer)
+        if checkpoint_every and completed:
+            writer.save_checkpoint(max_done, completed)
+    finally:
+        writer.close()
+    return written
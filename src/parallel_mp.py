@@ -0,0 +1,101 @@
+#process-pool variant of the duckdb city loader. threads overlap the
+#network waits fine, but the parse phase of a cached or local mirror run
+#is pure compute -- worker processes sidestep the gil entirely there.
+#results cross back as arrow ipc stream bytes (one contiguous buffer per
+#table) instead of pickled python rows; the main process stays the single
+#duckdb writer.
+
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import os
+import sys
+
+import pyarrow as pa
+
+from src.database import _PA_TYPES, DuckDBWriter
+from src.parallel import _normalize_base_url
+from src.sources.vgsi import VGSI_SOURCE, scrape_property
+
+
+def _envelope_rows(records, table, columns, batch_time):
+    rows = []
+    for record in records:
+        if table == "properties":
+            items = [record["property"]]
+        else:
+            items = record.get(table, [])
+        for item in items:
+            row = {name: item.get(name) for name, _ in columns}
+            row["scraped_at"] = batch_time
+            rows.append(row)
+    return rows
+
+
+def _scrape_chunk(base, pids):
+    #runs in a worker process: scrape a contiguous pid slice and hand the
+    #rows back as per-table ipc payloads
+    records = []
+    scraped = []
+    for pid in pids:
+        try:
+            records.append(scrape_property(base, pid))
+        except Exception as exc:
+            sys.stderr.write(f"scrape failed for {pid}: {exc}\n")
+            continue
+        scraped.append(pid)
+
+    batch_time = datetime.now()
+    payloads = {}
+    for table, columns in VGSI_SOURCE.tables.items():
+        rows = _envelope_rows(records, table, columns, batch_time)
+        if not rows:
+            continue
+        schema = pa.schema(
+            [pa.field(name, _PA_TYPES[kind]) for name, kind in columns]
+            + [pa.field("scraped_at", pa.timestamp("us"))])
+        staged = pa.Table.from_pylist(rows, schema=schema)
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, schema) as ipc:
+            ipc.write_table(staged)
+        payloads[table] = sink.getvalue().to_pybytes()
+    return payloads, scraped
+
+
+def load_city_parallel_mp(city, base_url, pid_min, pid_max, db_path,
+                          max_workers=None, checkpoint=True, conn=None):
+    """Scrape a pid range with worker processes instead of threads.
+
+    Same contract as load_city_parallel, minus the knobs that only make
+    sense per-request (rate limiting, photos): each worker owns one
+    contiguous pid slice, so use this for parse-heavy runs where the
+    threaded loader leaves cores idle.
+    """
+    base = _normalize_base_url(base_url)
+    max_workers = max_workers or os.cpu_count() or 4
+    pids = range(pid_min, pid_max + 1)
+    #contiguous slices, one per worker: adjacent pids tend to be similar
+    #pages, so the slices stay roughly balanced
+    chunk = max(1, -(-len(pids) // max_workers))
+    chunks = [pids[i:i + chunk] for i in range(0, len(pids), chunk)]
+
+    writer = DuckDBWriter(city, VGSI_SOURCE, db_path, conn=conn)
+    written = 0
+    completed = 0
+    max_done = pid_min - 1
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            for payloads, scraped in pool.map(_scrape_chunk,
+                                              [base] * len(chunks), chunks):
+                for table, payload in payloads.items():
+                    staged = pa.ipc.open_stream(payload).read_all()
+                    writer.write_arrow(table, staged)
+                    if table == "properties":
+                        written += staged.num_rows
+                completed += len(scraped)
+                if scraped:
+                    max_done = max(max_done, max(scraped))
+        if checkpoint and completed:
+            writer.save_checkpoint(max_done, completed)
+    finally:
+        writer.close()
+    return written
@@ -0,0 +1,375 @@
+#append-only parquet output for scraped sources.
+#
+#layout: {data_dir}/{scope_key}/{table}/part-00000.parquet, one scope per
+#city. rows are never updated in place -- every scrape appends a new version
+#and "current state" is a query-time concern (row_number over version desc).
+
+from collections import defaultdict
+from datetime import datetime
+import io
+import json
+import os
+import pathlib
+import queue
+import threading
+
+import numpy as np
+import orjson
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset
+import pyarrow.parquet as pq
+import xxhash
+
+_PA_TYPES = {
+    "int64": pa.int64(),
+    "float64": pa.float64(),
+    "string": pa.string(),
+    "timestamp": pa.timestamp("us"),
+    "uint64": pa.uint64(),
+}
+
+#stamped onto every row by the writer, after the source's own columns
+_METADATA_COLUMNS = [
+    ("scraped_at", "timestamp"),
+    ("version", "int64"),
+    ("row_hash", "uint64"),
+]
+
+#parquet files are a stream of small sections (page headers, pages,
+#footer); buffering collapses them into few large write() syscalls
+_WRITE_BUFFER_SIZE = 128 * 1024
+
+
+def build_schemas(tables):
+    #arrow schemas for a source's table specs, metadata columns included.
+    #schemas depend only on the source definition, so sources build them
+    #once at import instead of every writer paying for the derivation.
+    return {
+        table: pa.schema(
+            [pa.field(name, _PA_TYPES[kind])
+             for name, kind in columns + _METADATA_COLUMNS])
+        for table, columns in tables.items()
+    }
+
+
+def compute_row_hash(data):
+    #content hash of a row dict, metadata excluded. used for refresh dedup
+    #and for spotting changed rows across scrapes. xxh3 rather than a
+    #crypto hash: collision odds over a scope's row count are negligible
+    #and it's an order of magnitude cheaper per row.
+    payload = json.dumps(data, sort_keys=True, default=str)
+    return xxhash.xxh3_64_intdigest(payload.encode())
+
+
+class ParquetWriter:
+    """Writes scrape envelopes for one source into per-table parquet files."""
+
+    def __init__(self, scope_key, source, data_dir, batch_size=10,
+                 _test_mode=False):
+        self.scope_key = scope_key
+        self.source = source
+        self.data_dir = data_dir
+        self.batch_size = batch_size
+        #test mode skips compression, column statistics and dictionary
+        #encoding -- files are written once and read back once, so that
+        #cpu is pure overhead there
+        self._parquet_options = (
+            {"compression": None, "write_statistics": False,
+             "use_dictionary": False}
+            if _test_mode else {})
+        #sources precompile their schemas at import; deriving here is only
+        #a fallback for ad-hoc Source objects
+        self._schemas = source.schemas or build_schemas(source.tables)
+        self._columns = {
+            table: [name for name, _ in columns]
+            for table, columns in source.tables.items()
+        }
+        self._buffers = defaultdict(list)  #scope -> pending envelopes
+        self._part_counters = defaultdict(int)  #(scope, table) -> next part
+        self._open_parts = {}  #(scope, table) -> live pq.ParquetWriter
+        self._open_handles = {}  #(scope, table) -> (buffered, raw)
+        self._pending_checkpoints = {}  #scope -> state not yet on disk
+        self._write_queues = {}  #table -> queue feeding its writer thread
+        self._write_threads = {}
+        self._write_error = None  #first exception raised off-thread
+        self._versions = {}  #(scope, pid) -> last written version
+        self._existing_hashes = None  #set after preload_hashes()
+        self._hash_values = None  #arrow mirror of the set, for pc.is_in
+        self.rows_written = 0  #entries written (post-dedup)
+        self.rows_skipped = 0  #entries dropped as unchanged
+
+    def append(self, record, scope_key=None):
+        #buffer a single envelope; the actual parquet write happens once
+        #batch_size records have accumulated, so per-record callers don't
+        #pay a schema build + file write per row.
+        scope = scope_key or self.scope_key
+        self._buffers[scope].append(record)
+        if len(self._buffers[scope]) >= self.batch_size:
+            self.flush(scope_key=scope)
+
+    def flush(self, scope_key=None):
+        #write out any buffered envelopes. with no scope given, every
+        #buffered scope is flushed (close() relies on this).
+        if scope_key is None:
+            scopes = [s for s, buf in self._buffers.items() if buf]
+        else:
+            scopes = [scope_key] if self._buffers.get(scope_key) else []
+        for scope in scopes:
+            records = self._buffers.pop(scope)
+            self.write_batch(records, scope_key=scope)
+
+    def write_batch(self, records, scope_key=None, timestamps=None):
+        #records are envelopes from the source's scrape_fn: one "property"
+        #dict plus a row list per child table. timestamps, when given, is a
+        #parallel list of explicit scraped_at values so several versions of
+        #an entry can land in one batch without separate calls.
+        scope = scope_key or self.scope_key
+        batch_time = datetime.now()
+        rows = defaultdict(list)
+
+        #property rows are hashed once per batch here in the writer path --
+        #scraper threads never hash, and the same values serve both dedup
+        #and the row_hash stamp below
+        batch_hashes = [compute_row_hash(record["property"])
+                        for record in records]
+        dedup_mask = None
+        if self._existing_hashes is not None and records:
+            #refresh mode: unchanged entries don't get a new version.
+            #one is_in kernel over the whole batch replaces a python set
+            #probe per row.
+            hash_array = pa.array(batch_hashes, type=pa.uint64())
+            dedup_mask = pc.is_in(hash_array, value_set=self._hash_values)
+            fresh = hash_array.filter(pc.invert(dedup_mask))
+            self._hash_values = pa.concat_arrays([self._hash_values, fresh])
+            self._existing_hashes.update(fresh.to_pylist())
+
+        for i, record in enumerate(records):
+            scraped_at = timestamps[i] if timestamps else batch_time
+            prop = record["property"]
+            if dedup_mask is not None and dedup_mask[i].as_py():
+                self.rows_skipped += 1
+                continue
+            self.rows_written += 1
+            version = self._versions.get((scope, prop["pid"]), 0) + 1
+            self._versions[(scope, prop["pid"])] = version
+            rows["properties"].append(
+                self._stamp(prop, "properties", scraped_at, version,
+                            row_hash=batch_hashes[i]))
+            for table in self.source.tables:
+                if table == "properties":
+                    continue
+                for item in record.get(table, []):
+                    rows[table].append(
+                        self._stamp(item, table, scraped_at, version))
+
+        for table, table_rows in rows.items():
+            self._enqueue_write(scope, table, table_rows)
+
+    def _stamp(self, data, table, scraped_at, version, row_hash=None):
+        row = {name: data.get(name) for name in self._columns[table]}
+        row["scraped_at"] = scraped_at
+        row["version"] = version
+        row["row_hash"] = (row_hash if row_hash is not None
+                           else compute_row_hash(data))
+        return row
+
+    def _enqueue_write(self, scope, table, rows):
+        #one background thread per table: properties and buildings batches
+        #land on disk concurrently instead of serializing through the
+        #caller. ordering within a table is preserved by its queue.
+        table_q = self._write_queues.get(table)
+        if table_q is None:
+            table_q = queue.Queue()
+            worker = threading.Thread(target=self._drain_table,
+                                      args=(table, table_q), daemon=True)
+            self._write_queues[table] = table_q
+            self._write_threads[table] = worker
+            worker.start()
+        table_q.put((scope, rows))
+
+    def _drain_table(self, table, table_q):
+        while True:
+            item = table_q.get()
+            try:
+                if item is None:
+                    return
+                scope, rows = item
+                self._write_file(scope, table, rows)
+            except Exception as exc:
+                if self._write_error is None:
+                    self._write_error = exc
+            finally:
+                table_q.task_done()
+
+    def _wait_writes(self):
+        #barrier only: queued batches reach their part files but the
+        #table threads stay up for the next batch
+        for table_q in self._write_queues.values():
+            table_q.join()
+        if self._write_error is not None:
+            error, self._write_error = self._write_error, None
+            raise error
+
+    def flush_all(self, scope_key=None):
+        #one durability barrier per checkpoint: drain buffered rows into
+        #the open parts, then fsync each part file exactly once. footers
+        #still wait for close(); this makes the row groups themselves
+        #survive a crash without finalizing the parts.
+        self.flush(scope_key=scope_key)
+        self._wait_writes()
+        for buffered, raw in self._open_handles.values():
+            buffered.flush()
+            os.fsync(raw.fileno())
+
+    def _join_writes(self):
+        #block until every queued batch has hit its part file, stop the
+        #table threads, and surface anything they raised
+        for table_q in self._write_queues.values():
+            table_q.join()
+            table_q.put(None)
+        for worker in self._write_threads.values():
+            worker.join()
+        self._write_queues.clear()
+        self._write_threads.clear()
+        if self._write_error is not None:
+            error, self._write_error = self._write_error, None
+            raise error
+
+    def _write_file(self, scope, table, rows):
+        #each flush lands as a row group in one persistent part file per
+        #(scope, table); the footer is only written when the part is
+        #closed, so a load run produces one file instead of one per batch
+        part_writer = self._open_parts.get((scope, table))
+        if part_writer is None:
+            part_writer = self._open_part(scope, table)
+        part_writer.write_table(
+            pa.Table.from_pylist(rows, schema=self._schemas[table]))
+
+    def _open_part(self, scope, table):
+        table_dir = os.path.join(self.data_dir, scope, table)
+        os.makedirs(table_dir, exist_ok=True)
+        if (scope, table) not in self._part_counters:
+            #a fresh writer over an existing scope continues the part
+            #numbering instead of clobbering earlier files
+            existing = pathlib.Path(table_dir).glob("part-*.parquet")
+            self._part_counters[(scope, table)] = sum(1 for _ in existing)
+        part = self._part_counters[(scope, table)]
+        self._part_counters[(scope, table)] = part + 1
+        path = os.path.join(table_dir, f"part-{part:05d}.parquet")
+        raw = open(path, "wb")
+        buffered = io.BufferedWriter(raw, buffer_size=_WRITE_BUFFER_SIZE)
+        part_writer = pq.ParquetWriter(buffered, self._schemas[table],
+                                       **self._parquet_options)
+        self._open_parts[(scope, table)] = part_writer
+        self._open_handles[(scope, table)] = (buffered, raw)
+        return part_writer
+
+    def _close_parts(self):
+        #emit footers and release file handles; readers can't open a part
+        #until this has run. lazy _open_part means writing again later
+        #simply starts the next part file.
+        self._join_writes()
+        for key, part_writer in self._open_parts.items():
+            part_writer.close()
+            buffered, raw = self._open_handles[key]
+            buffered.close()
+        self._open_parts.clear()
+        self._open_handles.clear()
+
+    def get_known_entry_ids(self, scope_key=None):
+        #pids already on disk for a scope; refresh runs use this to decide
+        #what to re-scrape.
+        scope = scope_key or self.scope_key
+        self._close_parts()
+        table_dir = os.path.join(
+            self.data_dir, scope, self.source.entry_table)
+        if not os.path.isdir(table_dir):
+            return set()
+        dataset = pa.dataset.dataset(table_dir, format="parquet")
+        column = self.source.entry_id_column
+        return set(dataset.to_table(columns=[column]).column(column).to_pylist())
+
+    def preload_hashes(self, scope_key=None):
+        #load the row hashes (and version high-water marks) already on disk
+        #for a scope, arming refresh dedup in write_batch. returns the
+        #number of hashes loaded.
+        scope = scope_key or self.scope_key
+        self._close_parts()
+        self._existing_hashes = set()
+        self._hash_values = pa.array([], type=pa.uint64())
+        table_dir = os.path.join(self.data_dir, scope, self.source.entry_table)
+        #first load of a scope hits this with nothing on disk: one isdir
+        #stat and at most one scandir, no pathlib objects or glob matching
+        if not os.path.isdir(table_dir):
+            return 0
+        with os.scandir(table_dir) as dir_entries:
+            files = [entry.path for entry in dir_entries
+                     if entry.name.endswith(".parquet")]
+        if not files:
+            return 0
+        dataset = pa.dataset.dataset(files, format="parquet")
+        #stream just the three columns we need, batch by batch -- wide
+        #property rows never get materialized
+        id_column = self.source.entry_id_column
+        scanner = dataset.scanner(
+            columns=["row_hash", id_column, "version"])
+        for batch in scanner.to_batches():
+            #one zero-copy hop through numpy instead of an object per hash
+            hashes = np.asarray(batch.column("row_hash"), dtype=np.uint64)
+            self._existing_hashes.update(hashes.tolist())
+            for pid, version in zip(batch.column(id_column).to_pylist(),
+                                    batch.column("version").to_pylist()):
+                key = (scope, pid)
+                if version > self._versions.get(key, 0):
+                    self._versions[key] = version
+        self._hash_values = pa.array(list(self._existing_hashes),
+                                     type=pa.uint64())
+        return len(self._existing_hashes)
+
+    def _checkpoint_path(self, scope):
+        return os.path.join(self.data_dir, "_checkpoints", f"{scope}.json")
+
+    def save_checkpoint(self, scope_key=None, last_entry_id=None,
+                        total_scraped=0):
+        #only stashes the state; successive saves between flushes coalesce
+        #into a single write instead of one rewrite each
+        scope = scope_key or self.scope_key
+        self._pending_checkpoints[scope] = {"last_entry_id": last_entry_id,
+                                            "total_scraped": total_scraped}
+
+    def flush_checkpoint(self, scope_key=None):
+        #persist pending checkpoint state via write-tmp + atomic rename,
+        #so a crash mid-write never leaves a truncated checkpoint behind
+        if scope_key is None:
+            scopes = list(self._pending_checkpoints)
+        else:
+            scopes = [scope_key] if scope_key in self._pending_checkpoints \
+                else []
+        for scope in scopes:
+            path = self._checkpoint_path(scope)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = path + ".tmp"
+            with open(tmp, "wb") as checkpoint_file:
+                checkpoint_file.write(
+                    orjson.dumps(self._pending_checkpoints.pop(scope)))
+                checkpoint_file.flush()
+                os.fsync(checkpoint_file.fileno())
+            os.replace(tmp, path)
+
+    def load_checkpoint(self, scope_key=None):
+        scope = scope_key or self.scope_key
+        if scope in self._pending_checkpoints:
+            return dict(self._pending_checkpoints[scope])
+        path = self._checkpoint_path(scope)
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as checkpoint_file:
+            return orjson.loads(checkpoint_file.read())
+
+    def close(self):
+        #data first, checkpoint last: a persisted checkpoint must never
+        #claim rows that aren't readable yet
+        self.flush()
+        self._close_parts()
+        self.flush_checkpoint()
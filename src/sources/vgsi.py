@@ -0,0 +1,483 @@
+#vgsi source definition: what tables a vgsi city produces and how to
+#scrape one parcel page into rows for those tables.
+#the old scraper.py only pulled the owner span; this is the full parcel page.
+
+from dataclasses import dataclass, field
+import functools
+import hashlib
+import re
+import uuid
+
+import orjson
+
+import requests
+import soupsieve
+from bs4.element import Tag
+from selectolax.lexbor import LexborHTMLParser
+
+import pyarrow as pa
+
+from src.parquet_writer import _PA_TYPES, build_schemas
+
+
+#maps the span ids on a vgsi Parcel.aspx page to our property columns.
+#lblTownName is the one span without the MainContent_ prefix.
+_PROPERTY_FIELDS = {
+    "MainContent_lblPid": ("pid", "int"),
+    "MainContent_lblAcctNum": ("account_number", None),
+    "lblTownName": ("town_name", None),
+    "MainContent_lblLocation": ("location", None),
+    "MainContent_lblGenOwner": ("owner", None),
+    "MainContent_lblPrice": ("sale_price", "money"),
+    "MainContent_lblGenAssessment": ("assessment_value", "money"),
+    "MainContent_lblGenAppraisal": ("appraisal_value", "money"),
+    "MainContent_lblBldCount": ("building_count", "int"),
+    "MainContent_lblLndSize": ("land_size", "float"),
+    "MainContent_lblLndFront": ("land_frontage", "float"),
+    "MainContent_lblDepth": ("land_depth", "float"),
+}
+
+#construction-detail labels (the grdCns key/value table) we know about.
+#anything not in here survives the scrape via extra_fields.
+CNS_MAPPING = {
+    "Style": "style",
+    "Model": "model",
+    "Grade": "grade",
+    "Stories": "stories",
+    "Occupancy": "occupancy",
+    "Exterior Wall 1": "exterior_wall",
+    "Roof Structure": "roof_structure",
+    "Roof Cover": "roof_cover",
+    "Interior Wall 1": "interior_wall",
+    "Heat Type": "heat_type",
+    "AC Type": "ac_type",
+    "Total Bedrooms": "bedrooms",
+    "Total Bthrms": "bathrooms",
+}
+
+@dataclass(slots=True)
+class Construction:
+    """Construction detail for one building: the labels we map, as slots,
+    and whatever else the town's grdCns table carries in extra."""
+    style: str = None
+    model: str = None
+    grade: str = None
+    stories: str = None
+    occupancy: str = None
+    exterior_wall: str = None
+    roof_structure: str = None
+    roof_cover: str = None
+    interior_wall: str = None
+    heat_type: str = None
+    ac_type: str = None
+    bedrooms: str = None
+    bathrooms: str = None
+    extra: dict = field(default_factory=dict)
+
+    def to_dict(self):
+        #label-keyed view, the shape the old dict-based parser returned
+        known = {label: getattr(self, column)
+                 for label, column in CNS_MAPPING.items()
+                 if getattr(self, column) is not None}
+        return {**known, **self.extra}
+
+
+#column layouts for the grid tables on a parcel page, in cell order.
+APPRAISAL_COLUMNS = [("year", "int"), ("improvements", "money"),
+                     ("land", "money"), ("total", "money")]
+ASSESSMENT_COLUMNS = APPRAISAL_COLUMNS
+OWNERSHIP_COLUMNS = [("owner", None), ("sale_price", "money"),
+                     ("certificate", None), ("book_page", None),
+                     ("sale_date", None)]
+SUB_AREA_COLUMNS = [("code", None), ("description", None),
+                    ("gross_area", "float"), ("living_area", "float")]
+FEATURE_COLUMNS = [("code", None), ("description", None),
+                   ("size", None), ("value", "money")]
+
+#placeholder art, which varies by town in extension and case
+_DEFAULT_PHOTO_RE = re.compile(r"/default\.(jpg|png|gif)$", re.IGNORECASE)
+
+#money cells drop symbol, separators and whitespace (nbsp included) in
+#one C-level translate pass -- for cells this small that's the whole
+#dfa-scan win without a native regex engine
+_MONEY_STRIP = str.maketrans("", "", "$, \t\r\n\xa0")
+
+
+def _handle_money(value):
+    #"$123,400" -> 123400.0, anything unparseable -> None
+    try:
+        if isinstance(value, str):
+            return float(value.translate(_MONEY_STRIP))
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _handle_float(value):
+    #"0.29 Acres" / "1,234" -> float of the leading number. most cells
+    #are plain numbers, so try the bare float first and only pay for the
+    #cleanup allocations when it raises
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    except TypeError:
+        return None
+    try:
+        return float(value.replace(",", "").split()[0])
+    except (IndexError, ValueError):
+        return None
+
+
+def _handle_int(value):
+    result = _handle_float(value)
+    return int(result) if result is not None else None
+
+
+_HANDLERS = {"money": _handle_money, "float": _handle_float, "int": _handle_int}
+
+
+def _coerce(value, kind):
+    if kind is None:
+        return value
+    return _HANDLERS[kind](value)
+
+
+#the parse functions take either a bs4 tree or a selectolax/lexbor one.
+#lexbor parses an order of magnitude faster for this find-by-id workload,
+#but bs4 stays supported -- dispatch is one hasattr on the node api.
+
+def _is_lexbor(node):
+    #can't duck-type this: bs4's attribute magic resolves any unknown
+    #name (node.css_first included) to a child-tag lookup, so test for
+    #the bs4 tree and treat everything else as lexbor
+    return not isinstance(node, Tag)
+
+
+def _find_id(root, tag, node_id):
+    if _is_lexbor(root):
+        return root.css_first(f"{tag}#{node_id}")
+    return root.find(tag, id=node_id)
+
+
+def _iter_tags(root, tag):
+    if _is_lexbor(root):
+        return root.css(tag)
+    return root.find_all(tag)
+
+
+def _text(node):
+    if _is_lexbor(node):
+        return node.text(strip=True)
+    return node.get_text(strip=True)
+
+
+def _attr(node, name):
+    if _is_lexbor(node):
+        return node.attributes.get(name)
+    return node.get(name)
+
+
+#compiled once at import: every property span (and lblTownName, the one
+#without the prefix) comes back in a single tree pass instead of one
+#find-by-id walk per field
+_PROPERTY_SPANS = soupsieve.compile(
+    'span[id^="MainContent_lbl"], span#lblTownName')
+_BUILDING_SPANS = soupsieve.compile('span[id^="MainContent_ctl"]')
+
+
+@functools.lru_cache(maxsize=None)
+def _table_rows_selector(table_id):
+    #grid ids repeat on every parcel page, so each compiles exactly once
+    return soupsieve.compile(f"table#{table_id} tr")
+
+
+def _table_rows(root, table_id):
+    #a grid's rows in one selector pass; [] when the table is absent
+    selector = _table_rows_selector(table_id)
+    if _is_lexbor(root):
+        return root.css(selector.pattern)
+    return selector.select(root)
+
+
+def _select_texts(root, selector):
+    #id -> stripped text for every node a compiled selector matches.
+    #lexbor compiles its own selectors internally, so it just gets the
+    #pattern string back
+    if _is_lexbor(root):
+        nodes = root.css(selector.pattern)
+    else:
+        nodes = selector.select(root)
+    texts = {}
+    for node in nodes:
+        node_id = _attr(node, "id")
+        if node_id:
+            texts[node_id] = _text(node)
+    return texts
+
+
+def _canonicalize(data):
+    #sorted-key orjson: compact canonical bytes, encoded in C -- less
+    #input for the sha256 than the stdlib's spaced output
+    if isinstance(data, dict):
+        return orjson.dumps(data, option=orjson.OPT_SORT_KEYS).decode()
+    return data
+
+
+@functools.lru_cache(maxsize=4096)
+def _uuid_cached(pid, data):
+    digest = hashlib.sha256(f"{pid}:{data}".encode()).digest()
+    return str(uuid.UUID(bytes=digest[:16]))
+
+
+def generate_uuid(pid, data):
+    #deterministic uuid so re-scrapes of the same parcel line up; the
+    #cache means retried or refreshed pages skip the sha256 entirely
+    return _uuid_cached(pid, _canonicalize(data))
+
+
+def parse_property(soup, pid):
+    data = {"pid": pid}
+    texts = _select_texts(soup, _PROPERTY_SPANS)
+    for span_id, (field, kind) in _PROPERTY_FIELDS.items():
+        if span_id in texts:
+            data[field] = _coerce(texts[span_id], kind)
+
+    #vgsi adds spans per town; keep unknown MainContent_lbl* so nothing is lost.
+    extra = {span_id: text for span_id, text in texts.items()
+             if span_id.startswith("MainContent_lbl")
+             and span_id not in _PROPERTY_FIELDS}
+    #orjson with sorted keys: same canonical form as before, encoded in C
+    data["extra_fields"] = orjson.dumps(
+        extra, option=orjson.OPT_SORT_KEYS).decode()
+
+    data["uuid"] = generate_uuid(
+        pid, f"{data.get('town_name')}|{data.get('location')}")
+    return data
+
+
+def parse_buildings(soup, property_uuid, pid):
+    #building sections are numbered MainContent_ctl01_, ctl02_, ...
+    count_span = _find_id(soup, "span", "MainContent_lblBldCount")
+    count = _handle_int(_text(count_span)) if count_span else None
+    if not count:
+        return []
+
+    #all ctlNN_ spans in one pass, then dict lookups per building
+    texts = _select_texts(soup, _BUILDING_SPANS)
+    buildings = []
+    for bid in range(1, count + 1):
+        prefix = f"MainContent_ctl{bid:02d}_"
+        building = {"property_uuid": property_uuid, "pid": pid, "bid": bid}
+
+        year = texts.get(prefix + "lblYearBuilt")
+        building["year_built"] = \
+            _handle_int(year) if year is not None else None
+        area = texts.get(prefix + "lblBldArea")
+        building["living_area"] = \
+            _handle_float(area) if area is not None else None
+
+        photo = _find_id(soup, "img", prefix + "imgPhoto")
+        photo_url = _attr(photo, "src") if photo is not None else None
+        if photo_url and _DEFAULT_PHOTO_RE.search(photo_url):
+            photo_url = None  #placeholder image, not worth downloading
+        building["photo_url"] = photo_url
+
+        #construction detail table is label/value rows; known labels fill
+        #the slotted dataclass, the rest ride in its extra dict
+        construction = Construction()
+        for row in _table_rows(soup, prefix + "grdCns"):
+            cells = _iter_tags(row, "td")
+            if len(cells) >= 2:
+                label = _text(cells[0]).rstrip(":")
+                column = CNS_MAPPING.get(label)
+                if column is not None:
+                    setattr(construction, column, _text(cells[1]))
+                else:
+                    construction.extra[label] = _text(cells[1])
+        building["construction"] = construction
+        buildings.append(building)
+    return buildings
+
+
+def parse_table_rows(soup, table_id, columns):
+    #generic grid-table reader; first row is the header.
+    rows = []
+    for tr in _table_rows(soup, table_id)[1:]:
+        cells = [_text(td) for td in _iter_tags(tr, "td")]
+        if not cells:
+            continue
+        row = {}
+        for (name, kind), value in zip(columns, cells):
+            row[name] = _coerce(value, kind)
+        rows.append(row)
+    return rows
+
+
+#building rows flatten into this fixed key order -- the dict is sized
+#once up front instead of growing insert by insert, and the order
+#matches the buildings column layout the writers declare
+_BUILDING_ROW_KEYS = (
+    "property_uuid", "pid", "bid", "year_built", "living_area",
+    "photo_url", *CNS_MAPPING.values(), "extra_fields")
+
+
+def flatten_vgsi(parsed):
+    #nested parse result -> one envelope of per-table row lists, the shape
+    #ParquetWriter.write_batch expects. construction dicts get flattened
+    #through CNS_MAPPING, leftovers land in extra_fields.
+    prop = parsed["property"]
+    record = {"property": prop}
+
+    buildings = []
+    for building in parsed.get("buildings", []):
+        construction = building.get("construction") or Construction()
+        row = dict.fromkeys(_BUILDING_ROW_KEYS)
+        for key, value in building.items():
+            if key != "construction":
+                row[key] = value
+        for column in CNS_MAPPING.values():
+            row[column] = getattr(construction, column)
+        row["extra_fields"] = orjson.dumps(
+            construction.extra, option=orjson.OPT_SORT_KEYS).decode()
+        buildings.append(row)
+    record["buildings"] = buildings
+
+    for table in ("sub_areas", "ownership", "appraisals", "assessments",
+                  "extra_features", "outbuildings"):
+        rows = []
+        for item in parsed.get(table, []):
+            row = dict(item)
+            row.setdefault("property_uuid", prop["uuid"])
+            row.setdefault("pid", prop["pid"])
+            rows.append(row)
+        record[table] = rows
+    return record
+
+
+def parse_parcel_page(soup, pid):
+    #one parcel page -> writer envelope
+    prop = parse_property(soup, pid)
+    parsed = {
+        "property": prop,
+        "buildings": parse_buildings(soup, prop["uuid"], pid),
+        "ownership": parse_table_rows(
+            soup, "MainContent_grdSales", OWNERSHIP_COLUMNS),
+        "appraisals": parse_table_rows(
+            soup, "MainContent_grdHistoryValuesAppr", APPRAISAL_COLUMNS),
+        "assessments": parse_table_rows(
+            soup, "MainContent_grdHistoryValuesAsmt", ASSESSMENT_COLUMNS),
+        "extra_features": parse_table_rows(
+            soup, "MainContent_grdXf", FEATURE_COLUMNS),
+        "outbuildings": parse_table_rows(
+            soup, "MainContent_grdOb", FEATURE_COLUMNS),
+    }
+    sub_areas = []
+    for building in parsed["buildings"]:
+        prefix = f"MainContent_ctl{building['bid']:02d}_"
+        for row in parse_table_rows(soup, prefix + "grdSub", SUB_AREA_COLUMNS):
+            row["bid"] = building["bid"]
+            sub_areas.append(row)
+    parsed["sub_areas"] = sub_areas
+    return flatten_vgsi(parsed)
+
+
+def scrape_property(base_url, pid, url=None):
+    #ssl certs are bad on several town sites, same deal as scraper.py.
+    #callers that precompute their urls pass url= and skip the format.
+    page = requests.get(url or f"{base_url}{pid}", verify=False, timeout=30)
+    #lexbor tree: both the parse and the compiled selector passes run in
+    #C, and the parse releases the gil for the parallel loaders
+    tree = LexborHTMLParser(page.content)
+    return parse_parcel_page(tree, pid)
+
+
+@dataclass
+class Source:
+    """A scrape target: the tables it produces and how to fetch one entry."""
+    name: str
+    tables: dict  #table name -> [(column, type)] in write order
+    scrape_fn: object
+    entry_table: str = "properties"
+    entry_id_column: str = "pid"
+    schemas: dict = None  #table name -> pa.schema, compiled at import
+
+
+VGSI_TABLES = {
+    "properties": [
+        ("uuid", "string"), ("pid", "int64"), ("account_number", "string"),
+        ("town_name", "string"), ("location", "string"), ("owner", "string"),
+        ("sale_price", "float64"), ("assessment_value", "float64"),
+        ("appraisal_value", "float64"), ("building_count", "int64"),
+        ("land_size", "float64"), ("land_frontage", "float64"),
+        ("land_depth", "float64"), ("extra_fields", "string"),
+    ],
+    "buildings": [
+        ("property_uuid", "string"), ("pid", "int64"), ("bid", "int64"),
+        ("year_built", "int64"), ("living_area", "float64"),
+        ("photo_url", "string"), ("style", "string"), ("model", "string"),
+        ("grade", "string"), ("stories", "string"), ("occupancy", "string"),
+        ("exterior_wall", "string"), ("roof_structure", "string"),
+        ("roof_cover", "string"), ("interior_wall", "string"),
+        ("heat_type", "string"), ("ac_type", "string"),
+        ("bedrooms", "string"), ("bathrooms", "string"),
+        ("extra_fields", "string"),
+    ],
+    "sub_areas": [
+        ("property_uuid", "string"), ("pid", "int64"), ("bid", "int64"),
+        ("code", "string"), ("description", "string"),
+        ("gross_area", "float64"), ("living_area", "float64"),
+    ],
+    "ownership": [
+        ("property_uuid", "string"), ("pid", "int64"), ("owner", "string"),
+        ("sale_price", "float64"), ("certificate", "string"),
+        ("book_page", "string"), ("sale_date", "string"),
+    ],
+    "appraisals": [
+        ("property_uuid", "string"), ("pid", "int64"), ("year", "int64"),
+        ("improvements", "float64"), ("land", "float64"),
+        ("total", "float64"),
+    ],
+    "assessments": [
+        ("property_uuid", "string"), ("pid", "int64"), ("year", "int64"),
+        ("improvements", "float64"), ("land", "float64"),
+        ("total", "float64"),
+    ],
+    "extra_features": [
+        ("property_uuid", "string"), ("pid", "int64"), ("code", "string"),
+        ("description", "string"), ("size", "string"), ("value", "float64"),
+    ],
+    "outbuildings": [
+        ("property_uuid", "string"), ("pid", "int64"), ("code", "string"),
+        ("description", "string"), ("size", "string"), ("value", "float64"),
+    ],
+}
+
+#bare column schemas (no writer metadata), for the columnar conversion
+_ARROW_SCHEMAS = {
+    table: pa.schema([pa.field(name, _PA_TYPES[kind])
+                      for name, kind in columns])
+    for table, columns in VGSI_TABLES.items()
+}
+
+
+def envelopes_to_arrow(records):
+    """Batch of scrape envelopes -> one pyarrow table per vgsi table.
+
+    The row-dict envelope stays the contract the writers consume; this
+    columnar form is for callers that analyze or ship batches directly
+    (zero-copy to parquet/pandas, ipc across processes).
+    """
+    tables = {}
+    for table, schema in _ARROW_SCHEMAS.items():
+        if table == "properties":
+            rows = [record["property"] for record in records]
+        else:
+            rows = [row for record in records
+                    for row in record.get(table, [])]
+        tables[table] = pa.Table.from_pylist(rows, schema=schema)
+    return tables
+
+
+VGSI_SOURCE = Source(name="vgsi", tables=VGSI_TABLES, scrape_fn=scrape_property,
+                     schemas=build_schemas(VGSI_TABLES))
@@ -0,0 +1,374 @@
+#tests for the load engine: rate limiting, parallel loads, checkpoints,
+#and refresh dedup. the scrape_fn is mocked -- no town site gets hit.
+
+import asyncio
+import functools
+import itertools
+import threading
+import time
+
+import duckdb
+import pytest
+
+from src.engine import RateLimiter, run_load, run_load_async, run_refresh
+from src.parquet_writer import ParquetWriter
+from src.sources.vgsi import VGSI_SOURCE
+
+BASE_URL = "https://gis.vgsi.com/testcityct/Parcel.aspx?pid="
+
+
+@pytest.fixture(scope="module")
+def duckdb_conn():
+    #one in-memory duckdb for the whole module; a fresh connect() per
+    #assertion pays extension-load + catalog-init every time
+    conn = duckdb.connect()
+    yield conn
+    conn.close()
+
+
+def _count_rows(conn, temp_dir, table):
+    return conn.execute(
+        f"SELECT COUNT(*) FROM "
+        f"read_parquet('{temp_dir}/testcity/{table}/*.parquet')"
+    ).fetchone()[0]
+
+
+@pytest.fixture
+def temp_dir(tmp_path):
+    #tmp_path over mkdtemp: pytest owns cleanup (keeping failures around
+    #per the retention policy) and basetemp can be pointed at tmpfs
+    return str(tmp_path)
+
+
+@pytest.fixture
+def stub_scrape(monkeypatch):
+    #swaps scrape_fn in directly instead of going through unittest.mock:
+    #no MagicMock machinery per test, and call accounting is a plain list
+    #of the pids scraped
+    calls = []
+
+    def _install(fn):
+        def _recording(base_url, pid):
+            calls.append(pid)
+            return fn(base_url, pid)
+        monkeypatch.setattr(VGSI_SOURCE, "scrape_fn", _recording)
+        return calls
+
+    return _install
+
+
+def _make_writer(temp_dir):
+    return ParquetWriter("testcity", VGSI_SOURCE, temp_dir, _test_mode=True)
+
+
+def make_load_iter(lo, hi):
+    return lambda: iter(range(lo, hi + 1))
+
+
+@functools.lru_cache(maxsize=None)
+def _fake_property(pid, value=100000.0):
+    #cached so mocked scrapes are dict lookups, not dict construction;
+    #the writer never mutates envelopes, so sharing them is safe
+    return {
+        "property": {
+            "pid": pid,
+            "uuid": f"test-{pid}",
+            "town_name": "Test Town",
+            "location": f"{pid} MAIN ST",
+            "assessment_value": value,
+            "extra_fields": "{}",
+        },
+        "buildings": [],
+        "sub_areas": [],
+        "ownership": [],
+        "appraisals": [],
+        "assessments": [],
+        "extra_features": [],
+        "outbuildings": [],
+    }
+
+
+def fake_scrape(base_url, pid):
+    return _fake_property(pid)
+
+
+class TestRateLimiter:
+
+    def test_rate_limiter_basic(self):
+        limiter = RateLimiter(100)
+        for _ in range(3):
+            with limiter.acquire():
+                pass
+        assert limiter.get_stats()["total_requests"] == 3
+
+    def test_rate_limiter_enforces_interval(self):
+        limiter = RateLimiter(10)
+        #integer nanoseconds, same clock the limiter runs on: no float
+        #rounding at the threshold and immune to wall-clock adjustment
+        start_ns = time.monotonic_ns()
+        for _ in range(4):
+            with limiter.acquire():
+                pass
+        elapsed_ns = time.monotonic_ns() - start_ns
+        #4 slots at 10/s: last slot is at t0+0.3
+        assert elapsed_ns >= 250_000_000
+        assert elapsed_ns < 2_000_000_000
+
+    def test_rate_limiter_concurrent(self):
+        limiter = RateLimiter(50)
+        #next() on a shared count is atomic under the gil -- no lock to
+        #smear the timing we're measuring
+        counter = itertools.count()
+
+        def worker():
+            with limiter.acquire():
+                next(counter)
+
+        start_ns = time.monotonic_ns()
+        threads = [threading.Thread(target=worker) for _ in range(5)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed_ns = time.monotonic_ns() - start_ns
+        assert next(counter) == 5
+        #5 slots at 50/s: last slot is at t0+0.08
+        assert elapsed_ns >= 60_000_000
+
+    def test_rate_limiter_zero_rps_is_unthrottled(self):
+        limiter = RateLimiter(0)
+        start_ns = time.monotonic_ns()
+        for _ in range(10):
+            with limiter.acquire():
+                pass
+        assert time.monotonic_ns() - start_ns < 100_000_000
+        assert limiter.get_stats()["total_requests"] == 10
+
+
+class TestRunLoad:
+
+    def test_run_load_basic(self, stub_scrape, temp_dir, duckdb_conn):
+        calls = stub_scrape(fake_scrape)
+        writer = _make_writer(temp_dir)
+        written = run_load(VGSI_SOURCE, writer, BASE_URL,
+                           make_load_iter(1, 5), max_workers=2,
+                           show_progress=False)
+        assert written == 5
+        assert len(calls) == 5
+        assert _count_rows(duckdb_conn, temp_dir, "properties") == 5
+
+    def test_run_load_batching(self, stub_scrape, temp_dir, duckdb_conn):
+        calls = stub_scrape(fake_scrape)
+        writer = _make_writer(temp_dir)
+        written = run_load(VGSI_SOURCE, writer, BASE_URL,
+                           make_load_iter(1, 10), max_workers=2,
+                           batch_size=3, show_progress=False)
+        assert written == 10
+        assert len(calls) == 10
+        assert _count_rows(duckdb_conn, temp_dir, "properties") == 10
+
+    def test_run_load_checkpoints(self, stub_scrape, temp_dir):
+        calls = stub_scrape(fake_scrape)
+        writer = _make_writer(temp_dir)
+        run_load(VGSI_SOURCE, writer, BASE_URL, make_load_iter(1, 10),
+                 max_workers=2, batch_size=5, checkpoint_every=3,
+                 show_progress=False)
+        checkpoint = writer.load_checkpoint()
+        assert checkpoint is not None
+        assert checkpoint["last_entry_id"] == 10
+        assert checkpoint["total_scraped"] == 10
+
+    def test_run_load_resume(self, stub_scrape, temp_dir, duckdb_conn):
+        calls = stub_scrape(fake_scrape)
+        writer = _make_writer(temp_dir)
+        run_load(VGSI_SOURCE, writer, BASE_URL, make_load_iter(1, 5),
+                 max_workers=2, checkpoint_every=5, show_progress=False)
+        assert len(calls) == 5
+
+        calls.clear()
+        written = run_load(VGSI_SOURCE, writer, BASE_URL,
+                           make_load_iter(1, 10), max_workers=2,
+                           checkpoint_every=5, resume=True,
+                           show_progress=False)
+        #entries 1-5 are covered by the checkpoint; only 6-10 get scraped
+        assert len(calls) == 5
+        assert written == 5
+        assert _count_rows(duckdb_conn, temp_dir, "properties") == 10
+
+    def test_run_load_error_handling(self, stub_scrape, temp_dir, duckdb_conn):
+        def flaky_scrape(base_url, pid):
+            if pid == 3:
+                raise ValueError("bad parcel page")
+            return fake_scrape(base_url, pid)
+
+        calls = stub_scrape(flaky_scrape)
+        writer = _make_writer(temp_dir)
+        written = run_load(VGSI_SOURCE, writer, BASE_URL,
+                           make_load_iter(1, 5), max_workers=2,
+                           show_progress=False)
+        assert written == 4
+        assert _count_rows(duckdb_conn, temp_dir, "properties") == 4
+
+    def test_run_load_surfaces_iterator_errors(self, stub_scrape, temp_dir):
+        #a broken entry listing must propagate, not wedge the drain loop
+        stub_scrape(fake_scrape)
+        writer = _make_writer(temp_dir)
+
+        def bad_iter():
+            yield 1
+            yield 2
+            raise RuntimeError("entry listing broke")
+
+        with pytest.raises(RuntimeError, match="entry listing broke"):
+            run_load(VGSI_SOURCE, writer, BASE_URL, bad_iter,
+                     max_workers=2, show_progress=False)
+
+    def test_run_load_surfaces_writer_errors(self, stub_scrape, temp_dir):
+        #a failing writer must propagate and release the pool threads
+        #blocked on the bounded queues
+        stub_scrape(fake_scrape)
+        writer = _make_writer(temp_dir)
+
+        def failing_append(record, scope_key=None):
+            raise RuntimeError("disk full")
+
+        writer.append = failing_append
+        with pytest.raises(RuntimeError, match="disk full"):
+            run_load(VGSI_SOURCE, writer, BASE_URL, make_load_iter(1, 50),
+                     max_workers=2, show_progress=False)
+
+    def test_run_load_rate_limited(self, stub_scrape, temp_dir):
+        calls = stub_scrape(fake_scrape)
+        writer = _make_writer(temp_dir)
+        limiter = RateLimiter(50)
+        run_load(VGSI_SOURCE, writer, BASE_URL, make_load_iter(1, 5),
+                 max_workers=3, rate_limiter=limiter, show_progress=False)
+        assert limiter.get_stats()["total_requests"] == 5
+
+
+class TestRunLoadAsync:
+
+    #the stubbed scrape_fn is sync, so these runs go through the
+    #default-executor fallback -- the drop-in path for existing sources
+
+    def test_run_load_async_basic(self, stub_scrape, temp_dir,
+                                  duckdb_conn):
+        calls = stub_scrape(fake_scrape)
+        writer = _make_writer(temp_dir)
+        written = asyncio.run(run_load_async(
+            VGSI_SOURCE, writer, BASE_URL, make_load_iter(1, 5),
+            max_concurrency=4))
+        assert written == 5
+        assert len(calls) == 5
+        assert _count_rows(duckdb_conn, temp_dir, "properties") == 5
+
+    def test_run_load_async_checkpoints(self, stub_scrape, temp_dir):
+        stub_scrape(fake_scrape)
+        writer = _make_writer(temp_dir)
+        asyncio.run(run_load_async(
+            VGSI_SOURCE, writer, BASE_URL, make_load_iter(1, 10),
+            max_concurrency=4, batch_size=5, checkpoint_every=3))
+        checkpoint = writer.load_checkpoint()
+        assert checkpoint is not None
+        assert checkpoint["last_entry_id"] == 10
+        assert checkpoint["total_scraped"] == 10
+
+    def test_run_load_async_error_handling(self, stub_scrape, temp_dir,
+                                           duckdb_conn):
+        def flaky_scrape(base_url, pid):
+            if pid == 3:
+                raise ValueError("bad parcel page")
+            return fake_scrape(base_url, pid)
+
+        stub_scrape(flaky_scrape)
+        writer = _make_writer(temp_dir)
+        written = asyncio.run(run_load_async(
+            VGSI_SOURCE, writer, BASE_URL, make_load_iter(1, 5),
+            max_concurrency=4))
+        assert written == 4
+        assert _count_rows(duckdb_conn, temp_dir, "properties") == 4
+
+
+class TestRunRefresh:
+
+    def test_run_refresh_rescrapes_known_ids(self, stub_scrape, temp_dir):
+        calls = stub_scrape(fake_scrape)
+        writer = _make_writer(temp_dir)
+        run_load(VGSI_SOURCE, writer, BASE_URL, make_load_iter(1, 5),
+                 max_workers=2, show_progress=False)
+
+        calls.clear()
+        refresher = _make_writer(temp_dir)
+        run_refresh(VGSI_SOURCE, refresher, BASE_URL, max_workers=2,
+                    show_progress=False)
+        assert len(calls) == 5
+
+
+class TestRefreshDedup:
+
+    def test_preload_hashes_empty_scope(self, temp_dir):
+        writer = _make_writer(temp_dir)
+        assert writer.preload_hashes() == 0
+
+    def test_refresh_skips_unchanged_rows(self, stub_scrape, temp_dir, duckdb_conn):
+        calls = stub_scrape(fake_scrape)
+        writer = _make_writer(temp_dir)
+        run_load(VGSI_SOURCE, writer, BASE_URL, make_load_iter(1, 5),
+                 max_workers=2, show_progress=False)
+
+        refresher = _make_writer(temp_dir)
+        written = run_refresh(VGSI_SOURCE, refresher, BASE_URL,
+                              max_workers=2, show_progress=False)
+        assert written == 0
+        assert refresher.rows_skipped == 5
+        assert _count_rows(duckdb_conn, temp_dir, "properties") == 5
+
+    def test_refresh_writes_only_changed_rows(self, stub_scrape, temp_dir, duckdb_conn):
+        calls = stub_scrape(fake_scrape)
+        writer = _make_writer(temp_dir)
+        run_load(VGSI_SOURCE, writer, BASE_URL, make_load_iter(1, 5),
+                 max_workers=2, show_progress=False)
+
+        def changed_scrape(base_url, pid):
+            if pid in (2, 4):
+                return _fake_property(pid, value=999999.0)
+            return _fake_property(pid)
+
+        stub_scrape(changed_scrape)
+        refresher = _make_writer(temp_dir)
+        written = run_refresh(VGSI_SOURCE, refresher, BASE_URL,
+                              max_workers=2, show_progress=False)
+        assert written == 2
+        assert refresher.rows_skipped == 3
+        assert _count_rows(duckdb_conn, temp_dir, "properties") == 7
+
+
+class TestIntegration:
+
+    def test_full_workflow_integration(self, stub_scrape, temp_dir, duckdb_conn):
+        def scrape_with_building(base_url, pid):
+            #shallow copy before deviating from the cached envelope
+            record = dict(_fake_property(pid))
+            record["buildings"] = [
+                {"property_uuid": f"test-{pid}", "pid": pid, "bid": 1,
+                 "year_built": 1950, "style": "Colonial",
+                 "extra_fields": "{}"},
+            ]
+            return record
+
+        calls = stub_scrape(scrape_with_building)
+        writer = _make_writer(temp_dir)
+        written = run_load(VGSI_SOURCE, writer, BASE_URL,
+                           make_load_iter(1, 10), max_workers=3,
+                           batch_size=4, checkpoint_every=5,
+                           show_progress=False)
+        assert written == 10
+        assert _count_rows(duckdb_conn, temp_dir, "properties") == 10
+        assert _count_rows(duckdb_conn, temp_dir, "buildings") == 10
+        assert writer.load_checkpoint()["total_scraped"] == 10
+
+        #refresh over identical data adds no versions
+        refresher = _make_writer(temp_dir)
+        run_refresh(VGSI_SOURCE, refresher, BASE_URL, max_workers=3,
+                    show_progress=False)
+        assert _count_rows(duckdb_conn, temp_dir, "properties") == 10
@@ -0,0 +1,343 @@
+#tests for the duckdb-backed parallel loader. scrape_property is swapped
+#out at the module level -- no town site gets hit.
+
+import multiprocessing
+import os
+
+import duckdb
+import pyarrow as pa
+import pytest
+
+import src.database as database
+import src.parallel as parallel
+import src.parallel_async as parallel_async
+import src.parallel_mp as parallel_mp
+from src.parallel import load_city_parallel
+from src.sources.vgsi import VGSI_SOURCE
+
+BASE_URL = "https://gis.vgsi.com/testcityct/Parcel.aspx?pid="
+
+
+@pytest.fixture(scope="class")
+def temp_db(tmp_path_factory):
+    #one database file per test class: duckdb startup (mmap + catalog)
+    #is paid once, and the per-test cleanup below resets the contents
+    return str(tmp_path_factory.mktemp("duck") / "scrape.duckdb")
+
+
+@pytest.fixture(autouse=True)
+def _clean_db(temp_db):
+    yield
+    if not os.path.exists(temp_db):
+        return
+    conn = duckdb.connect(temp_db)
+    try:
+        for (schema,) in conn.execute(
+                "SELECT schema_name FROM information_schema.schemata "
+                "WHERE schema_name NOT IN "
+                "('main', 'information_schema', 'pg_catalog')").fetchall():
+            conn.execute(f'DROP SCHEMA "{schema}" CASCADE')
+        conn.execute("DROP TABLE IF EXISTS main.scrape_checkpoints")
+    finally:
+        conn.close()
+    #the dropped schemas are still marked ready process-wide; force the
+    #next writer to rerun its ddl
+    database._SCHEMA_READY.clear()
+
+
+@pytest.fixture
+def stub_scrape(monkeypatch):
+    #same shape as the engine tests: swap the module symbol directly and
+    #record the (base_url, pid) pairs that come through
+    calls = []
+
+    def _install(fn):
+        def _recording(base_url, pid, url=None):
+            calls.append((base_url, pid))
+            return fn(base_url, pid)
+        monkeypatch.setattr(parallel, "scrape_property", _recording)
+        return calls
+
+    return _install
+
+
+#one template envelope, specialized per pid with dict splats: the fakes
+#run once per pid per test, so they shouldn't rebuild seven keys of
+#nested structure from literals every call
+_PROPERTY_TEMPLATE = {
+    "town_name": "Test Town",
+    "assessment_value": 100000.0,
+    "extra_fields": "{}",
+}
+_EMPTY_TABLES = {table: () for table in (
+    "buildings", "sub_areas", "ownership", "appraisals", "assessments",
+    "extra_features", "outbuildings")}
+
+
+def fake_scrape(base_url, pid):
+    return {
+        "property": {**_PROPERTY_TEMPLATE, "pid": pid,
+                     "uuid": f"test-{pid}", "location": f"{pid} MAIN ST"},
+        **_EMPTY_TABLES,
+    }
+
+
+def fake_scrape_with_building(base_url, pid):
+    record = fake_scrape(base_url, pid)
+    record["buildings"] = [{
+        "property_uuid": f"test-{pid}",
+        "pid": pid,
+        "bid": 1,
+        "year_built": 1950,
+        "style": "Cape",
+        "photo_url": f"https://gis.vgsi.com/photos/{pid}.jpg",
+        "extra_fields": "{}",
+    }]
+    return record
+
+
+def _query_one(db_path, sql, params=None):
+    conn = duckdb.connect(db_path)
+    try:
+        return conn.execute(sql, params or []).fetchone()
+    finally:
+        conn.close()
+
+
+class TestDuckDBWriter:
+
+    def test_writer_defaults_to_in_memory(self):
+        #the advertised db_path=None default must open an in-memory
+        #database rather than crash inside duckdb.connect
+        writer = database.DuckDBWriter("testcity", VGSI_SOURCE)
+        try:
+            writer.write_batch([fake_scrape(BASE_URL, 1)])
+            count = writer.conn.execute(
+                'SELECT COUNT(*) FROM "testcity".properties').fetchone()
+            assert count[0] == 1
+        finally:
+            writer.close()
+
+
+class TestLoadCityParallel:
+
+    def test_load_city_parallel_basic(self, stub_scrape, temp_db):
+        calls = stub_scrape(fake_scrape)
+        written = load_city_parallel("testcity", BASE_URL, 1, 5, temp_db,
+                                     max_workers=2, show_progress=False)
+        assert written == 5
+        assert len(calls) == 5
+        count = _query_one(
+            temp_db, 'SELECT COUNT(*) FROM "testcity".properties')
+        assert count[0] == 5
+
+    def test_load_city_parallel_batching(self, stub_scrape, temp_db):
+        stub_scrape(fake_scrape)
+        written = load_city_parallel("testcity", BASE_URL, 1, 10, temp_db,
+                                     max_workers=2, batch_size=3,
+                                     show_progress=False)
+        assert written == 10
+        count = _query_one(
+            temp_db, 'SELECT COUNT(*) FROM "testcity".properties')
+        assert count[0] == 10
+
+    def test_load_city_parallel_checkpoints(self, stub_scrape, temp_db):
+        stub_scrape(fake_scrape)
+        load_city_parallel("testcity", BASE_URL, 1, 10, temp_db,
+                           max_workers=2, batch_size=5, checkpoint_every=3,
+                           show_progress=False)
+        row = _query_one(
+            temp_db,
+            "SELECT last_pid, total_scraped FROM main.scrape_checkpoints "
+            "WHERE city = ?", ["testcity"])
+        assert row == (10, 10)
+
+    def test_load_city_parallel_resume(self, stub_scrape, temp_db):
+        calls = stub_scrape(fake_scrape)
+        load_city_parallel("testcity", BASE_URL, 1, 5, temp_db,
+                           max_workers=2, checkpoint_every=5,
+                           show_progress=False)
+        assert len(calls) == 5
+
+        calls.clear()
+        written = load_city_parallel("testcity", BASE_URL, 1, 10, temp_db,
+                                     max_workers=2, checkpoint_every=5,
+                                     resume=True, show_progress=False)
+        #pids 1-5 are behind the checkpoint; only 6-10 get scraped
+        assert len(calls) == 5
+        assert written == 5
+        count = _query_one(
+            temp_db, 'SELECT COUNT(*) FROM "testcity".properties')
+        assert count[0] == 10
+
+    def test_load_city_parallel_url_normalization(self, stub_scrape,
+                                                  temp_db):
+        calls = stub_scrape(fake_scrape)
+        load_city_parallel("testcity", "https://gis.vgsi.com/testcityct",
+                           1, 3, temp_db, max_workers=2,
+                           show_progress=False)
+        assert all(base.endswith("/Parcel.aspx?pid=") for base, _ in calls)
+
+    def test_load_city_parallel_with_photos(self, stub_scrape, temp_db,
+                                            monkeypatch):
+        stub_scrape(fake_scrape_with_building)
+        downloads = []
+        monkeypatch.setattr(
+            parallel, "download_photo",
+            lambda url, dest: downloads.append((url, dest)))
+        load_city_parallel("testcity", BASE_URL, 1, 5, temp_db,
+                           max_workers=2, download_photos=True,
+                           show_progress=False)
+        assert len(downloads) == 5
+        assert all(url.endswith(".jpg") for url, _ in downloads)
+
+    def test_load_city_parallel_handles_errors(self, stub_scrape, temp_db):
+        def flaky_scrape(base_url, pid):
+            if pid == 3:
+                raise ValueError("bad parcel page")
+            return fake_scrape(base_url, pid)
+
+        stub_scrape(flaky_scrape)
+        written = load_city_parallel("testcity", BASE_URL, 1, 5, temp_db,
+                                     max_workers=2, show_progress=False)
+        assert written == 4
+        count = _query_one(
+            temp_db, 'SELECT COUNT(*) FROM "testcity".properties')
+        assert count[0] == 4
+
+
+class TestLoadCityAsync:
+
+    @pytest.fixture
+    def stub_async_scrape(self, monkeypatch):
+        #the loader's seams are module-level: _fetch never leaves the
+        #process and _parse turns the canned html into an envelope
+        calls = []
+
+        def _install(fn):
+            async def fake_fetch(session, url):
+                return "<html></html>"
+
+            def recording_parse(html, pid):
+                calls.append(pid)
+                return fn(BASE_URL, pid)
+
+            monkeypatch.setattr(parallel_async, "_fetch", fake_fetch)
+            monkeypatch.setattr(parallel_async, "_parse", recording_parse)
+            return calls
+
+        return _install
+
+    def test_load_city_async_basic(self, stub_async_scrape, temp_db):
+        calls = stub_async_scrape(fake_scrape)
+        written = parallel_async.load_city_async(
+            "testcity", BASE_URL, 1, 5, temp_db, max_concurrency=4)
+        assert written == 5
+        assert sorted(calls) == [1, 2, 3, 4, 5]
+        count = _query_one(
+            temp_db, 'SELECT COUNT(*) FROM "testcity".properties')
+        assert count[0] == 5
+
+    def test_load_city_async_checkpoints(self, stub_async_scrape, temp_db):
+        stub_async_scrape(fake_scrape)
+        parallel_async.load_city_async(
+            "testcity", BASE_URL, 1, 10, temp_db, max_concurrency=4,
+            batch_size=5, checkpoint_every=3)
+        row = _query_one(
+            temp_db,
+            "SELECT last_pid, total_scraped FROM main.scrape_checkpoints "
+            "WHERE city = ?", ["testcity"])
+        assert row == (10, 10)
+
+    def test_load_city_async_handles_errors(self, stub_async_scrape,
+                                            temp_db):
+        def flaky_scrape(base_url, pid):
+            if pid == 3:
+                raise ValueError("bad parcel page")
+            return fake_scrape(base_url, pid)
+
+        stub_async_scrape(flaky_scrape)
+        written = parallel_async.load_city_async(
+            "testcity", BASE_URL, 1, 5, temp_db, max_concurrency=4)
+        assert written == 4
+        count = _query_one(
+            temp_db, 'SELECT COUNT(*) FROM "testcity".properties')
+        assert count[0] == 4
+
+
+#the process-pool stubs lean on fork: workers inherit the monkeypatched
+#module instead of re-importing the real scraper
+_FORK_ONLY = pytest.mark.skipif(
+    multiprocessing.get_start_method() != "fork",
+    reason="stubbing workers needs the fork start method")
+
+
+class TestLoadCityParallelMP:
+
+    @_FORK_ONLY
+    def test_load_city_parallel_mp_basic(self, monkeypatch, temp_db):
+        monkeypatch.setattr(parallel_mp, "scrape_property", fake_scrape)
+        written = parallel_mp.load_city_parallel_mp(
+            "testcity", BASE_URL, 1, 5, temp_db, max_workers=2)
+        assert written == 5
+        count = _query_one(
+            temp_db, 'SELECT COUNT(*) FROM "testcity".properties')
+        assert count[0] == 5
+
+    @_FORK_ONLY
+    def test_load_city_parallel_mp_checkpoints(self, monkeypatch, temp_db):
+        monkeypatch.setattr(parallel_mp, "scrape_property", fake_scrape)
+        parallel_mp.load_city_parallel_mp(
+            "testcity", BASE_URL, 1, 10, temp_db, max_workers=2)
+        row = _query_one(
+            temp_db,
+            "SELECT last_pid, total_scraped FROM main.scrape_checkpoints "
+            "WHERE city = ?", ["testcity"])
+        assert row == (10, 10)
+
+    def test_scrape_chunk_ipc_round_trip(self, monkeypatch, temp_db):
+        #the worker payload -> write_arrow path, in-process: the ipc
+        #bytes must rebuild into tables the staging view accepts
+        monkeypatch.setattr(parallel_mp, "scrape_property", fake_scrape)
+        payloads, scraped = parallel_mp._scrape_chunk(BASE_URL, range(1, 4))
+        assert scraped == [1, 2, 3]
+        writer = database.DuckDBWriter("testcity", VGSI_SOURCE, temp_db)
+        try:
+            for table, payload in payloads.items():
+                staged = pa.ipc.open_stream(payload).read_all()
+                writer.write_arrow(table, staged)
+        finally:
+            writer.close()
+        count = _query_one(
+            temp_db, 'SELECT COUNT(*) FROM "testcity".properties')
+        assert count[0] == 3
+
+
+class TestIntegration:
+
+    def test_full_workflow_integration(self, stub_scrape, temp_db):
+        stub_scrape(fake_scrape_with_building)
+        written = load_city_parallel("newhaven", BASE_URL, 1, 10, temp_db,
+                                     max_workers=3, batch_size=4,
+                                     checkpoint_every=5,
+                                     show_progress=False)
+        assert written == 10
+
+        conn = duckdb.connect(temp_db)
+        try:
+            tables = {row[0] for row in conn.execute(
+                "SELECT table_name FROM information_schema.tables "
+                "WHERE table_schema = 'newhaven'").fetchall()}
+            assert {"properties", "buildings"} <= tables
+            assert conn.execute(
+                'SELECT COUNT(*) FROM "newhaven".properties'
+            ).fetchone()[0] == 10
+            assert conn.execute(
+                'SELECT COUNT(*) FROM "newhaven".buildings'
+            ).fetchone()[0] == 10
+            assert conn.execute(
+                "SELECT last_pid, total_scraped FROM "
+                "main.scrape_checkpoints WHERE city = 'newhaven'"
+            ).fetchone() == (10, 10)
+        finally:
+            conn.close()
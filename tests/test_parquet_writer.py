@@ -0,0 +1,316 @@
+#tests for the parquet writer layer: per-table writes, query-time
+#versioning, and the refresh helpers. assertions go through duckdb so we
+#exercise the same read path the analysis notebooks use.
+
+from datetime import datetime
+from pathlib import Path
+import os
+
+import duckdb
+import pytest
+
+from src.parquet_writer import ParquetWriter, compute_row_hash
+from src.sources.vgsi import VGSI_SOURCE
+
+
+#duckdb lazily loads the parquet extension on the first read_parquet
+#call; warm it once before any test so no test pays that cost inline
+@pytest.fixture(scope="session", autouse=True)
+def _preload_duckdb():
+    conn = duckdb.connect()
+    conn.execute("LOAD parquet")
+    conn.close()
+
+
+#one in-process duckdb for the whole module; every assertion query reuses
+#it instead of paying connect/close (catalog + extension init) per call.
+@pytest.fixture(scope="module")
+def duck():
+    conn = duckdb.connect()
+    yield conn
+    conn.close()
+
+
+@pytest.fixture(scope="session")
+def data_dir(tmp_path_factory):
+    #pytest cleans its own tmp dirs in bulk, no rmtree finalizer needed
+    return str(tmp_path_factory.mktemp("parquet"))
+
+
+#one writer for the whole session; tests isolate through a per-test
+#scope_key subdirectory instead of rebuilding writer state every test.
+@pytest.fixture(scope="session")
+def writer(data_dir):
+    w = ParquetWriter("testcity", VGSI_SOURCE, data_dir, _test_mode=True)
+    yield w
+    w.close()
+
+
+@pytest.fixture
+def scope_key(request):
+    return request.node.name
+
+
+def _property_base(pid=1):
+    return {
+        "pid": pid,
+        "uuid": f"uuid-{pid}",
+        "account_number": str(pid),
+        "town_name": "Testville, CT",
+        "location": f"{pid} MAIN ST",
+        "owner": "SMITH JOHN",
+        "sale_price": 250000.0,
+        "assessment_value": 100000.0,
+        "appraisal_value": 140000.0,
+        "building_count": 1,
+        "land_size": 0.29,
+        "extra_fields": "{}",
+    }
+
+
+#shared child-table template: the writer only iterates these, so every
+#envelope can alias the same empty tuples instead of allocating seven
+#fresh lists per record
+_EMPTY_CHILD_TABLES = {
+    "buildings": (),
+    "sub_areas": (),
+    "ownership": (),
+    "appraisals": (),
+    "assessments": (),
+    "extra_features": (),
+    "outbuildings": (),
+}
+
+
+def _envelope(prop):
+    return {"property": prop, **_EMPTY_CHILD_TABLES}
+
+
+def _refresh_views(conn, writer, scope_key):
+    #one view per touched table, over a concrete file list: a view defined
+    #on a glob makes duckdb re-scan the directory on every query, so the
+    #glob is resolved in python once per write instead.
+    writer.close()  #finalize open parts so the footers exist to read
+    for table in writer.source.tables:
+        table_dir = Path(writer.data_dir, scope_key, table)
+        if table_dir.is_dir():
+            files = sorted(str(f) for f in table_dir.glob("*.parquet"))
+            conn.execute(
+                f"CREATE OR REPLACE VIEW {table} AS "
+                f"SELECT * FROM read_parquet({files!r})")
+
+
+def _write_batch(conn, writer, records, scope_key):
+    writer.write_batch(records, scope_key=scope_key)
+    _refresh_views(conn, writer, scope_key)
+
+
+def _query_parquet(conn, table, columns, where="", params=None):
+    #callers name just the columns they assert on: parquet is columnar, so
+    #anything not projected never leaves disk. predicate values come in as
+    #bind parameters so duckdb can reuse the prepared plan, and the result
+    #is an arrow table straight from duckdb's columnar buffers.
+    sql = f"SELECT {', '.join(columns)} FROM {table}"
+    if where:
+        sql += f" WHERE {where}"
+    return conn.execute(sql, params or []).to_arrow_table()
+
+
+def _count_parquet(conn, table):
+    return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+
+class TestParquetWriter:
+
+    def test_write_property_data(self, duck, writer, data_dir, scope_key):
+        _write_batch(duck, writer, [_envelope(_property_base(1))], scope_key)
+        assert _count_parquet(duck, "properties") == 1
+        rows = duck.execute(
+            "SELECT pid, owner FROM properties").to_arrow_table()
+        assert rows.to_pylist() == [{"pid": 1, "owner": "SMITH JOHN"}]
+
+    def test_batch_write_multiple_properties(self, duck, writer, data_dir, scope_key):
+        batch = [_envelope(_property_base(pid)) for pid in range(1, 21)]
+        _write_batch(duck, writer, batch, scope_key)
+        assert _count_parquet(duck, "properties") == 20
+        pids = duck.execute("SELECT pid FROM properties").fetchnumpy()
+        assert set(pids["pid"]) == set(range(1, 21))
+
+    def test_write_buildings(self, duck, writer, data_dir, scope_key):
+        prop = _property_base(1)
+        record = _envelope(prop)
+        record["buildings"] = [
+            {"property_uuid": prop["uuid"], "pid": 1, "bid": 1,
+             "year_built": 1950, "style": "Colonial", "extra_fields": "{}"},
+            {"property_uuid": prop["uuid"], "pid": 1, "bid": 2,
+             "year_built": 1980, "style": "Ranch", "extra_fields": "{}"},
+        ]
+        _write_batch(duck, writer, [record], scope_key)
+        rows = duck.execute(
+            "SELECT bid, style FROM buildings").to_arrow_table()
+        assert set(zip(rows.column("bid").to_pylist(),
+                       rows.column("style").to_pylist())) == \
+            {(1, "Colonial"), (2, "Ranch")}
+
+    def test_write_sub_areas(self, duck, writer, data_dir, scope_key):
+        prop = _property_base(1)
+        record = _envelope(prop)
+        record["sub_areas"] = [
+            {"property_uuid": prop["uuid"], "pid": 1, "bid": 1,
+             "code": "BAS", "description": "First Floor",
+             "gross_area": 1040.0, "living_area": 1040.0},
+            {"property_uuid": prop["uuid"], "pid": 1, "bid": 1,
+             "code": "FGR", "description": "Garage",
+             "gross_area": 440.0, "living_area": 0.0},
+        ]
+        _write_batch(duck, writer, [record], scope_key)
+        rows = duck.execute(
+            "SELECT code, gross_area FROM sub_areas").to_arrow_table()
+        assert set(zip(rows.column("code").to_pylist(),
+                       rows.column("gross_area").to_pylist())) == \
+            {("BAS", 1040.0), ("FGR", 440.0)}
+
+    def test_write_ownership(self, duck, writer, data_dir, scope_key):
+        prop = _property_base(1)
+        record = _envelope(prop)
+        record["ownership"] = [
+            {"property_uuid": prop["uuid"], "pid": 1, "owner": "SMITH JOHN",
+             "sale_price": 250000.0, "sale_date": "06/15/2015"},
+            {"property_uuid": prop["uuid"], "pid": 1, "owner": "DOE JANE",
+             "sale_price": 180000.0, "sale_date": "03/01/2001"},
+        ]
+        _write_batch(duck, writer, [record], scope_key)
+        rows = duck.execute(
+            "SELECT owner, sale_price FROM ownership").to_arrow_table()
+        assert set(zip(rows.column("owner").to_pylist(),
+                       rows.column("sale_price").to_pylist())) == \
+            {("DOE JANE", 180000.0), ("SMITH JOHN", 250000.0)}
+
+    def test_empty_child_tables_write_no_files(self, duck, writer, data_dir,
+                                               scope_key):
+        _write_batch(duck, writer, [_envelope(_property_base(1))], scope_key)
+        assert _count_parquet(duck, "properties") == 1
+        assert not os.path.exists(f"{data_dir}/{scope_key}/buildings")
+
+
+class TestQueryTimeVersioning:
+
+    def test_effective_dates(self, duck, writer, data_dir, scope_key):
+        #explicit timestamps let both versions land in one batch instead
+        #of sleeping between write_batch calls
+        property_base = _property_base(1)
+        batch = []
+        for value in (100000.0, 105000.0):
+            prop = property_base.copy()
+            prop["assessment_value"] = value
+            batch.append(_envelope(prop))
+        timestamps = [datetime(2026, 1, 1, 12, 0, 0),
+                      datetime(2026, 2, 1, 12, 0, 0)]
+        writer.write_batch(batch, scope_key=scope_key, timestamps=timestamps)
+        _refresh_views(duck, writer, scope_key)
+        rows = duck.execute(
+            "SELECT scraped_at, version FROM properties "
+            "ORDER BY version").to_arrow_table()
+        assert rows.column("version").to_pylist() == [1, 2]
+        scraped = rows.column("scraped_at").to_pylist()
+        assert scraped[0] < scraped[1]
+
+    def test_is_current_flag(self, duck, writer, data_dir, scope_key):
+        #the writer's per-pid version counter advances within a batch, so
+        #one call produces the same three versions as three calls did
+        property_base = _property_base(1)
+        batch = []
+        for i in range(3):
+            prop = property_base.copy()
+            prop["assessment_value"] = 100000.0 + i * 1000
+            batch.append(_envelope(prop))
+        _write_batch(duck, writer, batch, scope_key)
+        current = duck.execute(
+            "SELECT assessment_value FROM ("
+            "SELECT *, ROW_NUMBER() OVER "
+            "(PARTITION BY pid ORDER BY version DESC) AS rn FROM properties"
+            ") WHERE rn = ?", [1]).fetchnumpy()
+        assert list(current["assessment_value"]) == [102000.0]
+
+    def test_get_property_history(self, duck, writer, data_dir, scope_key):
+        property_base = _property_base(1)
+        batch = []
+        for value in (100000.0, 110000.0):
+            prop = property_base.copy()
+            prop["assessment_value"] = value
+            batch.append(_envelope(prop))
+        _write_batch(duck, writer, batch, scope_key)
+        rows = _query_parquet(duck, "properties", ["version"], "pid = ?", [1])
+        assert len(rows) == 2
+        versions = duck.execute(
+            "SELECT version FROM properties WHERE pid = ?", [1]).fetchnumpy()
+        assert set(versions["version"]) == {1, 2}
+
+    def test_current_state_via_row_number(self, duck, writer, data_dir, scope_key):
+        batch = []
+        for pid in (1, 2):
+            property_base = _property_base(pid)
+            for value in (100000.0, 120000.0):
+                prop = property_base.copy()
+                prop["assessment_value"] = value
+                batch.append(_envelope(prop))
+        _write_batch(duck, writer, batch, scope_key)
+        current = duck.execute(
+            "SELECT pid, assessment_value FROM ("
+            "SELECT *, ROW_NUMBER() OVER "
+            "(PARTITION BY pid ORDER BY version DESC) AS rn FROM properties"
+            ") WHERE rn = ?", [1]).to_arrow_table()
+        assert set(zip(current.column("pid").to_pylist(),
+                       current.column("assessment_value").to_pylist())) == \
+            {(1, 120000.0), (2, 120000.0)}
+
+    def test_sub_area_versioning(self, duck, writer, data_dir, scope_key):
+        prop = _property_base(1)
+        batch = []
+        for gross in (1040.0, 1200.0):
+            record = _envelope(prop.copy())
+            record["sub_areas"] = [
+                {"property_uuid": prop["uuid"], "pid": 1, "bid": 1,
+                 "code": "BAS", "description": "First Floor",
+                 "gross_area": gross, "living_area": gross},
+            ]
+            batch.append(record)
+        _write_batch(duck, writer, batch, scope_key)
+        rows = duck.execute(
+            "SELECT version, gross_area FROM sub_areas").to_arrow_table()
+        assert set(zip(rows.column("version").to_pylist(),
+                       rows.column("gross_area").to_pylist())) == \
+            {(1, 1040.0), (2, 1200.0)}
+
+
+class TestRefreshHelpers:
+
+    def test_get_known_entry_ids_returns_all_pids(self, duck, writer, data_dir,
+                                                  scope_key):
+        batch = [_envelope(_property_base(pid)) for pid in (1, 2, 3)]
+        _write_batch(duck, writer, batch, scope_key)
+        assert writer.get_known_entry_ids(scope_key=scope_key) == {1, 2, 3}
+
+    def test_get_known_entry_ids_empty_scope(self, writer, scope_key):
+        assert writer.get_known_entry_ids(scope_key=scope_key) == set()
+
+
+#reference hash computed once at import; each test compares a single
+#fresh computation against it instead of hashing both sides per assert
+_HASH_INPUT = {"pid": 1, "owner": "SMITH JOHN", "assessment_value": 100000.0}
+_EXPECTED_HASH = compute_row_hash(_HASH_INPUT)
+
+
+class TestHashFunction:
+
+    def test_hash_deterministic(self):
+        assert compute_row_hash(dict(_HASH_INPUT)) == _EXPECTED_HASH
+
+    def test_hash_key_order_insensitive(self):
+        reordered = {"assessment_value": 100000.0, "owner": "SMITH JOHN",
+                     "pid": 1}
+        assert compute_row_hash(reordered) == _EXPECTED_HASH
+
+    def test_hash_differs_on_change(self):
+        changed = dict(_HASH_INPUT, owner="DOE JANE")
+        assert compute_row_hash(changed) != _EXPECTED_HASH
@@ -0,0 +1,323 @@
+#tests for the vgsi parcel parser. html fragments are cut-down
+#Parcel.aspx pages under tests/fixtures -- just the spans and grids the
+#parse functions look at, read as bytes once at import.
+#module-scoped soup fixtures parse each page once for the whole module:
+#the parse functions never mutate the tree.
+
+import functools
+import json
+import pathlib
+
+import pytest
+from bs4 import BeautifulSoup, SoupStrainer
+from hypothesis import given, settings
+from hypothesis import strategies as st
+from selectolax.lexbor import LexborHTMLParser
+
+import src.sources.vgsi as vgsi
+from src.sources.vgsi import (
+    APPRAISAL_COLUMNS,
+    OWNERSHIP_COLUMNS,
+    _handle_float,
+    _handle_int,
+    _handle_money,
+    generate_uuid,
+    parse_buildings,
+    parse_parcel_page,
+    parse_property,
+    parse_table_rows,
+)
+
+#everything in here is a pure function of its html fragment
+pytestmark = pytest.mark.parsing
+
+#page fragments live under tests/fixtures, read once per process into
+#plain immutable bytes. not mmap'd: bs4 treats anything with .read() as
+#a file and consumes its position, so a shared map parses empty on the
+#second use
+_FIXTURE_DIR = pathlib.Path(__file__).parent / "fixtures"
+
+
+def _fixture(name):
+    return (_FIXTURE_DIR / f"{name}.html").read_bytes()
+
+
+_HTML_PROPERTY = _fixture("property")
+_HTML_BUILDINGS = _fixture("buildings")
+_HTML_DEFAULT_PHOTO = _fixture("default_photo")
+_HTML_APPRAISALS = _fixture("appraisals")
+_HTML_SALES_SHORT_ROW = _fixture("sales_short_row")
+_HTML_EXTRA_SPANS = _fixture("extra_spans")
+_HTML_MINIMAL_PAGE = _fixture("minimal_page")
+_HTML_SUB_AREAS = _fixture("sub_areas")
+
+
+#span-only pages don't need the rest of the tree built
+_SPANS_ONLY = SoupStrainer("span")
+
+
+def _soup(html, parse_only=None):
+    #lxml backend, same as the scrape path
+    return BeautifulSoup(html, "lxml", parse_only=parse_only)
+
+
+def _lexbor(html, parse_only=None):
+    #parse_only is a bs4 notion; lexbor builds the full tree regardless
+    return LexborHTMLParser(html)
+
+
+#the literals are immutable and the parse functions never mutate a tree,
+#so identical fragments across tests share one parse
+_cached_soup = functools.lru_cache(maxsize=64)(_soup)
+_cached_lexbor = functools.lru_cache(maxsize=64)(_lexbor)
+
+#every tree-taking test runs against both parser backends the parse
+#functions dispatch over
+_BACKENDS = {"bs4": _cached_soup, "lexbor": _cached_lexbor}
+
+
+@pytest.fixture(scope="module", params=sorted(_BACKENDS))
+def make_tree(request):
+    return _BACKENDS[request.param]
+
+
+@pytest.fixture(scope="module")
+def soup_property(make_tree):
+    return make_tree(_HTML_PROPERTY, parse_only=_SPANS_ONLY)
+
+
+@pytest.fixture(scope="module")
+def property_result(soup_property):
+    #one parse of the full page serves every field-group test below
+    return parse_property(soup_property, 123)
+
+
+@pytest.fixture(scope="module")
+def soup_buildings(make_tree):
+    return make_tree(_HTML_BUILDINGS)
+
+
+@pytest.fixture(scope="module")
+def soup_appraisals(make_tree):
+    return make_tree(_HTML_APPRAISALS)
+
+
+@pytest.fixture(scope="module")
+def soup_extra_spans(make_tree):
+    return make_tree(_HTML_EXTRA_SPANS, parse_only=_SPANS_ONLY)
+
+
+class TestParseProperty:
+
+    def test_parse_property_identity_fields(self, property_result):
+        assert property_result["pid"] == 123
+        assert property_result["account_number"] == "A-00123"
+        assert property_result["town_name"] == "Hartford, CT"
+        assert property_result["location"] == "10 MAIN ST"
+        assert property_result["owner"] == "SMITH JOHN"
+
+    def test_parse_property_money_fields(self, property_result):
+        assert property_result["sale_price"] == 200000.0
+        assert property_result["assessment_value"] == 150300.0
+        assert property_result["appraisal_value"] == 214700.0
+
+    def test_parse_property_numeric_fields(self, property_result):
+        assert property_result["building_count"] == 2
+        assert property_result["land_size"] == 0.29
+        assert property_result["land_frontage"] == 75.0
+        assert property_result["land_depth"] == 168.0
+
+    def test_compiled_selectors_reused_across_calls(self, monkeypatch):
+        #the span selectors are compiled once at import, not per parse:
+        #with the compiler spied out, parsing must never reach for it
+        compiles = []
+        monkeypatch.setattr(vgsi.soupsieve, "compile",
+                            lambda *args, **kwargs: compiles.append(args))
+        parse_property(_cached_soup(_HTML_PROPERTY), 123)
+        parse_property(_cached_soup(_HTML_PROPERTY), 123)
+        assert compiles == []
+
+    def test_parse_property_missing_spans(self, make_tree):
+        html = '<span id="MainContent_lblLocation">10 MAIN ST</span>'
+        data = parse_property(make_tree(html, parse_only=_SPANS_ONLY), 5)
+        assert data["location"] == "10 MAIN ST"
+        assert "owner" not in data
+        assert "assessment_value" not in data
+
+
+class TestParseBuildings:
+
+    def test_parse_buildings_multiple(self, soup_buildings):
+        buildings = parse_buildings(soup_buildings, "uuid-1", 123)
+        assert len(buildings) == 2
+        assert buildings[0]["bid"] == 1
+        assert buildings[0]["year_built"] == 1950
+        assert buildings[0]["living_area"] == 1200.0
+        assert buildings[0]["photo_url"] == "photos/123_1.jpg"
+        assert buildings[0]["construction"].style == "Cape"
+        assert buildings[0]["construction"].heat_type == "Hot Air"
+        assert buildings[0]["construction"].to_dict() == {
+            "Style": "Cape", "Heat Type": "Hot Air"}
+        assert buildings[1]["bid"] == 2
+        assert buildings[1]["year_built"] == 1988
+        assert buildings[1]["construction"].to_dict() == {}
+
+    def test_parse_buildings_zero_count(self, make_tree):
+        html = '<span id="MainContent_lblBldCount">0</span>'
+        assert parse_buildings(make_tree(html), "uuid-1", 123) == []
+
+    def test_parse_buildings_no_count_span(self, make_tree):
+        assert parse_buildings(make_tree("<p>vacant</p>"),
+                               "uuid-1", 123) == []
+
+    def test_flattened_building_rows_keep_column_order(self, make_tree):
+        #downstream writers rely on a stable key order per building row
+        record = parse_parcel_page(make_tree(_HTML_BUILDINGS), 123)
+        assert tuple(record["buildings"][0]) == vgsi._BUILDING_ROW_KEYS
+
+    def test_parse_buildings_skips_default_photo(self, make_tree):
+        buildings = parse_buildings(make_tree(_HTML_DEFAULT_PHOTO),
+                                    "uuid-1", 123)
+        assert buildings[0]["photo_url"] is None
+
+    def test_parse_buildings_skips_default_photo_variants(self, make_tree):
+        #extension and case differ per town
+        html = ('<span id="MainContent_lblBldCount">1</span>'
+                '<img id="MainContent_ctl01_imgPhoto"'
+                ' src="images/Default.PNG"/>')
+        buildings = parse_buildings(make_tree(html), "uuid-1", 123)
+        assert buildings[0]["photo_url"] is None
+
+
+class TestParseTableRows:
+
+    def test_parse_table_rows_basic(self, soup_appraisals):
+        rows = parse_table_rows(
+            soup_appraisals, "MainContent_grdHistoryValuesAppr",
+            APPRAISAL_COLUMNS)
+        assert len(rows) == 2
+        assert rows[0] == {"year": 2023, "improvements": 100000.0,
+                           "land": 50000.0, "total": 150000.0}
+
+    def test_parse_table_rows_missing_table(self, make_tree):
+        rows = parse_table_rows(
+            make_tree("<p>no grids</p>"), "MainContent_grdSales",
+            OWNERSHIP_COLUMNS)
+        assert rows == []
+
+    def test_table_selector_compiled_once_per_grid(self, make_tree):
+        parse_table_rows(make_tree(_HTML_SALES_SHORT_ROW),
+                         "MainContent_grdSales", OWNERSHIP_COLUMNS)
+        hits = vgsi._table_rows_selector.cache_info().hits
+        parse_table_rows(make_tree(_HTML_SALES_SHORT_ROW),
+                         "MainContent_grdSales", OWNERSHIP_COLUMNS)
+        assert vgsi._table_rows_selector.cache_info().hits > hits
+
+    def test_parse_table_rows_short_row(self, make_tree):
+        #a row with fewer cells than the layout only fills what's there
+        rows = parse_table_rows(make_tree(_HTML_SALES_SHORT_ROW),
+                                "MainContent_grdSales", OWNERSHIP_COLUMNS)
+        assert rows == [{"owner": "SMITH JOHN", "sale_price": 200000.0}]
+
+
+class TestArrowConversion:
+
+    def test_envelopes_to_arrow_columnar(self, make_tree):
+        record = parse_parcel_page(make_tree(_HTML_BUILDINGS), 123)
+        tables = vgsi.envelopes_to_arrow([record])
+        assert tables["properties"].num_rows == 1
+        assert tables["buildings"].column("style").to_pylist() \
+            == ["Cape", None]
+        assert tables["buildings"].column("bid").to_pylist() == [1, 2]
+
+
+class TestTypeCoercion:
+
+    def test_handle_money(self):
+        assert _handle_money("$123,400") == 123400.0
+        assert _handle_money(" $1,234.50 ") == 1234.50
+        assert _handle_money("$1\xa0234") == 1234.0  #nbsp separators
+        assert _handle_money("$0") == 0.0
+        assert _handle_money(150.5) == 150.5
+        assert _handle_money("n/a") is None
+        assert _handle_money(None) is None
+
+    def test_handle_float(self):
+        assert _handle_float("0.29 Acres") == 0.29
+        assert _handle_float("1,234") == 1234.0
+        assert _handle_float("") is None
+        assert _handle_float(None) is None
+
+    def test_handle_int(self):
+        assert _handle_int("2") == 2
+        assert _handle_int("1,200 SF") == 1200
+        assert _handle_int("unknown") is None
+
+    #property tests sweep the value space the hand-picked cases can't;
+    #deadline off because the first example pays hypothesis setup cost
+    @settings(max_examples=200, deadline=None)
+    @given(st.floats(min_value=0, max_value=1e9, allow_nan=False))
+    def test_handle_money_round_trips_vgsi_format(self, value):
+        formatted = f"${value:,.2f}"
+        assert _handle_money(formatted) == pytest.approx(round(value, 2))
+
+    @settings(max_examples=200, deadline=None)
+    @given(st.integers(min_value=0, max_value=10 ** 9))
+    def test_handle_int_round_trips_grouped_digits(self, value):
+        assert _handle_int(f"{value:,}") == value
+
+
+class TestUUIDGeneration:
+
+    def test_generate_uuid_deterministic(self):
+        assert generate_uuid(123, "Hartford|10 MAIN ST") \
+            == generate_uuid(123, "Hartford|10 MAIN ST")
+
+    def test_generate_uuid_varies_by_pid(self):
+        assert generate_uuid(123, "Hartford|10 MAIN ST") \
+            != generate_uuid(124, "Hartford|10 MAIN ST")
+
+    def test_generate_uuid_repeat_calls_hit_cache(self):
+        vgsi._uuid_cached.cache_clear()
+        generate_uuid(123, "Hartford|10 MAIN ST")
+        generate_uuid(123, "Hartford|10 MAIN ST")
+        assert vgsi._uuid_cached.cache_info().hits == 1
+
+
+class TestExtraFields:
+
+    def test_unknown_spans_survive(self, soup_extra_spans):
+        data = parse_property(soup_extra_spans, 5)
+        extra = json.loads(data["extra_fields"])
+        assert extra == {"MainContent_lblZoning": "R-1",
+                         "MainContent_lblNeighborhood": "0001"}
+
+    def test_extra_fields_canonical_encoding(self, soup_extra_spans):
+        #sorted keys, no whitespace: the string itself is stable, so
+        #callers can compare without decoding
+        data = parse_property(soup_extra_spans, 5)
+        assert data["extra_fields"] == (
+            '{"MainContent_lblNeighborhood":"0001",'
+            '"MainContent_lblZoning":"R-1"}')
+
+
+class TestEdgeCases:
+
+    def test_parse_property_empty_page(self, make_tree):
+        data = parse_property(make_tree(""), 7)
+        assert data["pid"] == 7
+        assert data["extra_fields"] == "{}"
+        assert data["uuid"]  #still deterministic from pid + Nones
+
+    def test_parse_parcel_page_minimal(self, make_tree):
+        record = parse_parcel_page(make_tree(_HTML_MINIMAL_PAGE), 9)
+        assert record["property"]["pid"] == 9
+        for table in ("buildings", "sub_areas", "ownership", "appraisals",
+                      "assessments", "extra_features", "outbuildings"):
+            assert record[table] == []
+
+    def test_parse_parcel_page_sub_areas_tagged_by_building(
+            self, make_tree):
+        record = parse_parcel_page(make_tree(_HTML_SUB_AREAS), 9)
+        assert record["sub_areas"][0]["bid"] == 1
+        assert record["sub_areas"][0]["gross_area"] == 912.0